@@ -1,37 +1,54 @@
-from pydantic import field_validator
-from pydantic_settings import BaseSettings, SettingsConfigDict
-
-
-class Settings(BaseSettings):
-    model_config = SettingsConfigDict(
-        env_file="../.env",
-        env_file_encoding="utf-8",
-        extra="ignore",
-    )
-
-    # Bot settings
-    bot_token: str
-
-    # Admin settings (comma-separated list of IDs)
-    admin_ids: list[int]
-
-    # Chat IDs
-    ru_payin_chat_id: int
-    eng_payin_chat_id: int
-    payout_chat_id: int
-
-    # Database
-    database_url: str = "sqlite+aiosqlite:///data/crm.db"
-
-    @property
-    def payin_chat_ids(self) -> list[int]:
-        """List of all pay-in chat IDs."""
-        return [self.ru_payin_chat_id, self.eng_payin_chat_id]
-
-    @property
-    def all_chat_ids(self) -> list[int]:
-        """List of all monitored chat IDs."""
-        return [self.ru_payin_chat_id, self.eng_payin_chat_id, self.payout_chat_id]
-
-
-settings = Settings()
+from functools import cached_property, lru_cache
+
+from pydantic import field_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file="../.env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+    )
+
+    # Bot settings
+    bot_token: str
+
+    # Admin settings (comma-separated list of IDs)
+    admin_ids: list[int]
+
+    # Chat IDs
+    ru_payin_chat_id: int
+    eng_payin_chat_id: int
+    payout_chat_id: int
+
+    # Database
+    database_url: str = "sqlite+aiosqlite:///data/crm.db"
+
+    # Register the catch-all debug router that logs every update
+    debug: bool = False
+
+    @cached_property
+    def admin_ids_set(self) -> frozenset[int]:
+        """Admin IDs as a frozenset for O(1) membership checks."""
+        return frozenset(self.admin_ids)
+
+    @cached_property
+    def payin_chat_ids(self) -> tuple[int, ...]:
+        """All pay-in chat IDs."""
+        return (self.ru_payin_chat_id, self.eng_payin_chat_id)
+
+    @cached_property
+    def all_chat_ids(self) -> tuple[int, ...]:
+        """All monitored chat IDs."""
+        return (self.ru_payin_chat_id, self.eng_payin_chat_id, self.payout_chat_id)
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Load and cache the settings.
+
+    Lazy so importing ``bot.config`` (e.g. from migration scripts or
+    tooling) does not require a fully populated environment.
+    """
+    return Settings()
@@ -1,348 +1,362 @@
-from datetime import date, timedelta
-
-from sqlalchemy import func, select
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from .models import PaymentIn, PaymentOut
-
-import logging
-
-logger = logging.getLogger(__name__)
-
-
-class PaymentInCRUD:
-    """CRUD operations for PaymentIn."""
-
-    @staticmethod
-    async def create(
-        session: AsyncSession,
-        payment_date: date,
-        amount: float,
-        client: str,
-        teacher: str,
-        chat_type: str,
-        message_id: int,
-        chat_id: int,
-    ) -> PaymentIn | None:
-        """Create a new incoming payment. Returns None if duplicate (same message_id + chat_id)."""
-        # Check for duplicate by message_id + chat_id
-        existing = await session.execute(
-            select(PaymentIn)
-            .where(PaymentIn.message_id == message_id)
-            .where(PaymentIn.chat_id == chat_id)
-        )
-        if existing.scalar_one_or_none():
-            logger.warning(
-                f"Duplicate PaymentIn skipped: message_id={message_id}, chat_id={chat_id}"
-            )
-            return None
-
-        payment = PaymentIn(
-            date=payment_date,
-            amount=amount,
-            client=client,
-            teacher=teacher,
-            chat_type=chat_type,
-            message_id=message_id,
-            chat_id=chat_id,
-        )
-        session.add(payment)
-        await session.commit()
-        await session.refresh(payment)
-        return payment
-
-    @staticmethod
-    async def get_last(session: AsyncSession) -> PaymentIn | None:
-        """Get the last incoming payment."""
-        result = await session.execute(
-            select(PaymentIn).order_by(PaymentIn.created_at.desc()).limit(1)
-        )
-        return result.scalar_one_or_none()
-
-    @staticmethod
-    async def get_total_amount(session: AsyncSession) -> float:
-        """Get total amount of all incoming payments."""
-        result = await session.execute(
-            select(func.coalesce(func.sum(PaymentIn.amount), 0))
-        )
-        return result.scalar_one()
-
-    @staticmethod
-    async def get_total_amount_current_month(session: AsyncSession) -> float:
-        """Get total amount of incoming payments for the current month."""
-        today = date.today()
-        start_date = date(today.year, today.month, 1)
-        result = await session.execute(
-            select(func.coalesce(func.sum(PaymentIn.amount), 0))
-            .where(PaymentIn.date >= start_date)
-            .where(PaymentIn.date <= today)
-        )
-        return result.scalar_one()
-
-    @staticmethod
-    async def get_count(session: AsyncSession) -> int:
-        """Get count of all incoming payments."""
-        result = await session.execute(select(func.count(PaymentIn.id)))
-        return result.scalar_one()
-
-    @staticmethod
-    async def get_count_current_month(session: AsyncSession) -> int:
-        """Get count of incoming payments for the current month."""
-        today = date.today()
-        start_date = date(today.year, today.month, 1)
-        result = await session.execute(
-            select(func.count(PaymentIn.id))
-            .where(PaymentIn.date >= start_date)
-            .where(PaymentIn.date <= today)
-        )
-        return result.scalar_one()
-
-    @staticmethod
-    async def get_last_7_days(session: AsyncSession) -> list[PaymentIn]:
-        """Get all incoming payments from the last 7 days."""
-        week_ago = date.today() - timedelta(days=7)
-        result = await session.execute(
-            select(PaymentIn)
-            .where(PaymentIn.date >= week_ago)
-            .order_by(PaymentIn.date.desc(), PaymentIn.created_at.desc())
-        )
-        return list(result.scalars().all())
-
-    @staticmethod
-    async def get_by_date_range(
-        session: AsyncSession,
-        start_date: date,
-        end_date: date,
-    ) -> list[PaymentIn]:
-        """Get all incoming payments within a date range."""
-        result = await session.execute(
-            select(PaymentIn)
-            .where(PaymentIn.date >= start_date)
-            .where(PaymentIn.date <= end_date)
-            .order_by(PaymentIn.date.desc(), PaymentIn.created_at.desc())
-        )
-        return list(result.scalars().all())
-
-    @staticmethod
-    async def get_current_month(session: AsyncSession) -> list[PaymentIn]:
-        """Get all incoming payments for the current month."""
-        today = date.today()
-        start_date = date(today.year, today.month, 1)
-        result = await session.execute(
-            select(PaymentIn)
-            .where(PaymentIn.date >= start_date)
-            .where(PaymentIn.date <= today)
-            .order_by(PaymentIn.date.desc(), PaymentIn.created_at.desc())
-        )
-        return list(result.scalars().all())
-
-    @staticmethod
-    async def get_previous_month(session: AsyncSession) -> list[PaymentIn]:
-        """Get all incoming payments for the previous month."""
-        today = date.today()
-        # Calculate previous month start and end
-        if today.month == 1:
-            prev_month_start = date(today.year - 1, 12, 1)
-            prev_month_end = date(today.year - 1, 12, 31)
-        else:
-            prev_month_start = date(today.year, today.month - 1, 1)
-            # Calculate last day of previous month
-            if today.month == 1:
-                prev_month_end = date(today.year - 1, 12, 31)
-            else:
-                # First day of current month minus 1 day
-                prev_month_end = date(today.year, today.month, 1) - timedelta(days=1)
-        
-        result = await session.execute(
-            select(PaymentIn)
-            .where(PaymentIn.date >= prev_month_start)
-            .where(PaymentIn.date <= prev_month_end)
-            .order_by(PaymentIn.date.desc(), PaymentIn.created_at.desc())
-        )
-        return list(result.scalars().all())
-
-    @staticmethod
-    async def delete_by_message_id(
-        session: AsyncSession,
-        message_id: int,
-        chat_id: int,
-    ) -> PaymentIn | None:
-        """Delete incoming payment by message_id and chat_id. Returns deleted payment or None."""
-        result = await session.execute(
-            select(PaymentIn)
-            .where(PaymentIn.message_id == message_id)
-            .where(PaymentIn.chat_id == chat_id)
-        )
-        payment = result.scalar_one_or_none()
-        if payment:
-            await session.delete(payment)
-            await session.commit()
-        return payment
-
-
-class PaymentOutCRUD:
-    """CRUD operations for PaymentOut."""
-
-    @staticmethod
-    async def create(
-        session: AsyncSession,
-        payment_date: date,
-        amount: float,
-        category: str,
-        recipient: str,
-        message_id: int,
-        chat_id: int,
-    ) -> PaymentOut | None:
-        """Create a new outgoing payment. Returns None if duplicate (same message_id + chat_id)."""
-        # Check for duplicate by message_id + chat_id
-        existing = await session.execute(
-            select(PaymentOut)
-            .where(PaymentOut.message_id == message_id)
-            .where(PaymentOut.chat_id == chat_id)
-        )
-        if existing.scalar_one_or_none():
-            logger.warning(
-                f"Duplicate PaymentOut skipped: message_id={message_id}, chat_id={chat_id}"
-            )
-            return None
-
-        payment = PaymentOut(
-            date=payment_date,
-            amount=amount,
-            category=category,
-            recipient=recipient,
-            message_id=message_id,
-            chat_id=chat_id,
-        )
-        session.add(payment)
-        await session.commit()
-        await session.refresh(payment)
-        return payment
-
-    @staticmethod
-    async def get_last(session: AsyncSession) -> PaymentOut | None:
-        """Get the last outgoing payment."""
-        result = await session.execute(
-            select(PaymentOut).order_by(PaymentOut.created_at.desc()).limit(1)
-        )
-        return result.scalar_one_or_none()
-
-    @staticmethod
-    async def get_total_amount(session: AsyncSession) -> float:
-        """Get total amount of all outgoing payments."""
-        result = await session.execute(
-            select(func.coalesce(func.sum(PaymentOut.amount), 0))
-        )
-        return result.scalar_one()
-
-    @staticmethod
-    async def get_total_amount_current_month(session: AsyncSession) -> float:
-        """Get total amount of outgoing payments for the current month."""
-        today = date.today()
-        start_date = date(today.year, today.month, 1)
-        result = await session.execute(
-            select(func.coalesce(func.sum(PaymentOut.amount), 0))
-            .where(PaymentOut.date >= start_date)
-            .where(PaymentOut.date <= today)
-        )
-        return result.scalar_one()
-
-    @staticmethod
-    async def get_count(session: AsyncSession) -> int:
-        """Get count of all outgoing payments."""
-        result = await session.execute(select(func.count(PaymentOut.id)))
-        return result.scalar_one()
-
-    @staticmethod
-    async def get_count_current_month(session: AsyncSession) -> int:
-        """Get count of outgoing payments for the current month."""
-        today = date.today()
-        start_date = date(today.year, today.month, 1)
-        result = await session.execute(
-            select(func.count(PaymentOut.id))
-            .where(PaymentOut.date >= start_date)
-            .where(PaymentOut.date <= today)
-        )
-        return result.scalar_one()
-
-    @staticmethod
-    async def get_last_7_days(session: AsyncSession) -> list[PaymentOut]:
-        """Get all outgoing payments from the last 7 days."""
-        week_ago = date.today() - timedelta(days=7)
-        result = await session.execute(
-            select(PaymentOut)
-            .where(PaymentOut.date >= week_ago)
-            .order_by(PaymentOut.date.desc(), PaymentOut.created_at.desc())
-        )
-        return list(result.scalars().all())
-
-    @staticmethod
-    async def get_by_date_range(
-        session: AsyncSession,
-        start_date: date,
-        end_date: date,
-    ) -> list[PaymentOut]:
-        """Get all outgoing payments within a date range."""
-        result = await session.execute(
-            select(PaymentOut)
-            .where(PaymentOut.date >= start_date)
-            .where(PaymentOut.date <= end_date)
-            .order_by(PaymentOut.date.desc(), PaymentOut.created_at.desc())
-        )
-        return list(result.scalars().all())
-
-    @staticmethod
-    async def get_current_month(session: AsyncSession) -> list[PaymentOut]:
-        """Get all outgoing payments for the current month."""
-        today = date.today()
-        start_date = date(today.year, today.month, 1)
-        result = await session.execute(
-            select(PaymentOut)
-            .where(PaymentOut.date >= start_date)
-            .where(PaymentOut.date <= today)
-            .order_by(PaymentOut.date.desc(), PaymentOut.created_at.desc())
-        )
-        return list(result.scalars().all())
-
-    @staticmethod
-    async def get_previous_month(session: AsyncSession) -> list[PaymentOut]:
-        """Get all outgoing payments for the previous month."""
-        today = date.today()
-        # Calculate previous month start and end
-        if today.month == 1:
-            prev_month_start = date(today.year - 1, 12, 1)
-            prev_month_end = date(today.year - 1, 12, 31)
-        else:
-            prev_month_start = date(today.year, today.month - 1, 1)
-            # Calculate last day of previous month
-            if today.month == 1:
-                prev_month_end = date(today.year - 1, 12, 31)
-            else:
-                # First day of current month minus 1 day
-                prev_month_end = date(today.year, today.month, 1) - timedelta(days=1)
-        
-        result = await session.execute(
-            select(PaymentOut)
-            .where(PaymentOut.date >= prev_month_start)
-            .where(PaymentOut.date <= prev_month_end)
-            .order_by(PaymentOut.date.desc(), PaymentOut.created_at.desc())
-        )
-        return list(result.scalars().all())
-
-    @staticmethod
-    async def delete_by_message_id(
-        session: AsyncSession,
-        message_id: int,
-        chat_id: int,
-    ) -> PaymentOut | None:
-        """Delete outgoing payment by message_id and chat_id. Returns deleted payment or None."""
-        result = await session.execute(
-            select(PaymentOut)
-            .where(PaymentOut.message_id == message_id)
-            .where(PaymentOut.chat_id == chat_id)
-        )
-        payment = result.scalar_one_or_none()
-        if payment:
-            await session.delete(payment)
-            await session.commit()
-        return payment
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+
+from sqlalchemy import desc, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import PaymentIn, PaymentOut
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentInRow(NamedTuple):
+    """Plain row of an incoming payment, for report rendering."""
+
+    date: date
+    amount: int
+    client: str
+    teacher: str
+    chat_type: str
+    created_at: datetime
+
+
+class PaymentOutRow(NamedTuple):
+    """Plain row of an outgoing payment, for report rendering."""
+
+    date: date
+    amount: int
+    category: str
+    recipient: str
+    created_at: datetime
+
+
+async def get_period_payments(
+    session: AsyncSession,
+    start_date: date,
+    end_date: date | None = None,
+) -> tuple[list[PaymentInRow], list[PaymentOutRow]]:
+    """Fetch incoming and outgoing payments for a period in one query.
+
+    Both tables are combined with UNION ALL and split on a literal
+    discriminator column, so one round trip replaces two. Rows come back
+    as named tuples — reports only read attributes, so skipping ORM
+    hydration avoids per-row instance and identity-map overhead.
+    """
+    in_select = select(
+        literal("in").label("kind"),
+        PaymentIn.date.label("date"),
+        PaymentIn.amount.label("amount"),
+        PaymentIn.client.label("field_a"),
+        PaymentIn.teacher.label("field_b"),
+        PaymentIn.chat_type.label("field_c"),
+        PaymentIn.created_at.label("created_at"),
+    ).where(PaymentIn.date >= start_date)
+    out_select = select(
+        literal("out"),
+        PaymentOut.date,
+        PaymentOut.amount,
+        PaymentOut.category,
+        PaymentOut.recipient,
+        literal(""),
+        PaymentOut.created_at,
+    ).where(PaymentOut.date >= start_date)
+    if end_date is not None:
+        in_select = in_select.where(PaymentIn.date <= end_date)
+        out_select = out_select.where(PaymentOut.date <= end_date)
+
+    stmt = in_select.union_all(out_select).order_by(desc("date"), desc("created_at"))
+    result = await session.execute(stmt)
+
+    incoming: list[PaymentInRow] = []
+    outgoing: list[PaymentOutRow] = []
+    for kind, pay_date, amount, field_a, field_b, field_c, created_at in result:
+        if kind == "in":
+            incoming.append(
+                PaymentInRow(pay_date, amount, field_a, field_b, field_c, created_at)
+            )
+        else:
+            outgoing.append(
+                PaymentOutRow(pay_date, amount, field_a, field_b, created_at)
+            )
+    return incoming, outgoing
+
+
+class PaymentInCRUD:
+    """CRUD operations for PaymentIn."""
+
+    @staticmethod
+    async def create(
+        session: AsyncSession,
+        payment_date: date,
+        amount: int,
+        client: str,
+        teacher: str,
+        chat_type: str,
+        message_id: int,
+        chat_id: int,
+    ) -> PaymentIn | None:
+        """Create a new incoming payment. Returns None if duplicate (same message_id + chat_id)."""
+        # Check for duplicate by message_id + chat_id
+        existing = await session.execute(
+            select(PaymentIn)
+            .where(PaymentIn.message_id == message_id)
+            .where(PaymentIn.chat_id == chat_id)
+        )
+        if existing.scalar_one_or_none():
+            logger.warning(
+                f"Duplicate PaymentIn skipped: message_id={message_id}, chat_id={chat_id}"
+            )
+            return None
+
+        stmt = (
+            insert(PaymentIn)
+            .values(
+                date=payment_date,
+                amount=amount,
+                client=client,
+                teacher=teacher,
+                chat_type=chat_type,
+                message_id=message_id,
+                chat_id=chat_id,
+            )
+            .returning(PaymentIn.id, PaymentIn.created_at)
+        )
+        row = (await session.execute(stmt)).one()
+        await session.commit()
+        return PaymentIn(
+            id=row.id,
+            date=payment_date,
+            amount=amount,
+            client=client,
+            teacher=teacher,
+            chat_type=chat_type,
+            message_id=message_id,
+            chat_id=chat_id,
+            created_at=row.created_at,
+        )
+
+    @staticmethod
+    async def get_last(session: AsyncSession) -> PaymentIn | None:
+        """Get the last incoming payment."""
+        result = await session.execute(
+            select(PaymentIn).order_by(PaymentIn.id.desc()).limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_total_amount(session: AsyncSession) -> int:
+        """Get total amount of all incoming payments."""
+        result = await session.execute(
+            select(func.coalesce(func.sum(PaymentIn.amount), 0))
+        )
+        return result.scalar_one()
+
+    @staticmethod
+    async def get_count(session: AsyncSession) -> int:
+        """Get count of all incoming payments."""
+        result = await session.execute(select(func.count(PaymentIn.id)))
+        return result.scalar_one()
+
+    @staticmethod
+    async def get_totals_by_date_range(
+        session: AsyncSession,
+        start_date: date,
+        end_date: date,
+    ) -> tuple[int, int]:
+        """Get total amount (cents) and count of incoming payments within a date range."""
+        result = await session.execute(
+            select(
+                func.coalesce(func.sum(PaymentIn.amount), 0),
+                func.count(PaymentIn.id),
+            )
+            .where(PaymentIn.date >= start_date)
+            .where(PaymentIn.date <= end_date)
+        )
+        total, count = result.one()
+        return total, count
+
+    @staticmethod
+    async def get_last_7_days(session: AsyncSession) -> list[PaymentIn]:
+        """Get all incoming payments from the last 7 days."""
+        week_ago = date.today() - timedelta(days=7)
+        result = await session.stream(
+            select(PaymentIn)
+            .where(PaymentIn.date >= week_ago)
+            .order_by(PaymentIn.date.desc(), PaymentIn.created_at.desc())
+            .execution_options(yield_per=500)
+        )
+        return [payment async for payment in result.scalars()]
+
+    @staticmethod
+    async def get_by_date_range(
+        session: AsyncSession,
+        start_date: date,
+        end_date: date,
+    ) -> list[PaymentIn]:
+        """Get all incoming payments within a date range."""
+        result = await session.stream(
+            select(PaymentIn)
+            .where(PaymentIn.date >= start_date)
+            .where(PaymentIn.date <= end_date)
+            .order_by(PaymentIn.date.desc(), PaymentIn.created_at.desc())
+            .execution_options(yield_per=500)
+        )
+        return [payment async for payment in result.scalars()]
+
+    @staticmethod
+    async def delete_by_message_id(
+        session: AsyncSession,
+        message_id: int,
+        chat_id: int,
+    ) -> PaymentIn | None:
+        """Delete incoming payment by message_id and chat_id. Returns deleted payment or None."""
+        result = await session.execute(
+            select(PaymentIn)
+            .where(PaymentIn.message_id == message_id)
+            .where(PaymentIn.chat_id == chat_id)
+        )
+        payment = result.scalar_one_or_none()
+        if payment:
+            await session.delete(payment)
+            await session.commit()
+        return payment
+
+
+class PaymentOutCRUD:
+    """CRUD operations for PaymentOut."""
+
+    @staticmethod
+    async def create(
+        session: AsyncSession,
+        payment_date: date,
+        amount: int,
+        category: str,
+        recipient: str,
+        message_id: int,
+        chat_id: int,
+    ) -> PaymentOut | None:
+        """Create a new outgoing payment. Returns None if duplicate (same message_id + chat_id)."""
+        # Check for duplicate by message_id + chat_id
+        existing = await session.execute(
+            select(PaymentOut)
+            .where(PaymentOut.message_id == message_id)
+            .where(PaymentOut.chat_id == chat_id)
+        )
+        if existing.scalar_one_or_none():
+            logger.warning(
+                f"Duplicate PaymentOut skipped: message_id={message_id}, chat_id={chat_id}"
+            )
+            return None
+
+        stmt = (
+            insert(PaymentOut)
+            .values(
+                date=payment_date,
+                amount=amount,
+                category=category,
+                recipient=recipient,
+                message_id=message_id,
+                chat_id=chat_id,
+            )
+            .returning(PaymentOut.id, PaymentOut.created_at)
+        )
+        row = (await session.execute(stmt)).one()
+        await session.commit()
+        return PaymentOut(
+            id=row.id,
+            date=payment_date,
+            amount=amount,
+            category=category,
+            recipient=recipient,
+            message_id=message_id,
+            chat_id=chat_id,
+            created_at=row.created_at,
+        )
+
+    @staticmethod
+    async def get_last(session: AsyncSession) -> PaymentOut | None:
+        """Get the last outgoing payment."""
+        result = await session.execute(
+            select(PaymentOut).order_by(PaymentOut.id.desc()).limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_total_amount(session: AsyncSession) -> int:
+        """Get total amount of all outgoing payments."""
+        result = await session.execute(
+            select(func.coalesce(func.sum(PaymentOut.amount), 0))
+        )
+        return result.scalar_one()
+
+    @staticmethod
+    async def get_count(session: AsyncSession) -> int:
+        """Get count of all outgoing payments."""
+        result = await session.execute(select(func.count(PaymentOut.id)))
+        return result.scalar_one()
+
+    @staticmethod
+    async def get_totals_by_date_range(
+        session: AsyncSession,
+        start_date: date,
+        end_date: date,
+    ) -> tuple[int, int]:
+        """Get total amount (cents) and count of outgoing payments within a date range."""
+        result = await session.execute(
+            select(
+                func.coalesce(func.sum(PaymentOut.amount), 0),
+                func.count(PaymentOut.id),
+            )
+            .where(PaymentOut.date >= start_date)
+            .where(PaymentOut.date <= end_date)
+        )
+        total, count = result.one()
+        return total, count
+
+    @staticmethod
+    async def get_last_7_days(session: AsyncSession) -> list[PaymentOut]:
+        """Get all outgoing payments from the last 7 days."""
+        week_ago = date.today() - timedelta(days=7)
+        result = await session.stream(
+            select(PaymentOut)
+            .where(PaymentOut.date >= week_ago)
+            .order_by(PaymentOut.date.desc(), PaymentOut.created_at.desc())
+            .execution_options(yield_per=500)
+        )
+        return [payment async for payment in result.scalars()]
+
+    @staticmethod
+    async def get_by_date_range(
+        session: AsyncSession,
+        start_date: date,
+        end_date: date,
+    ) -> list[PaymentOut]:
+        """Get all outgoing payments within a date range."""
+        result = await session.stream(
+            select(PaymentOut)
+            .where(PaymentOut.date >= start_date)
+            .where(PaymentOut.date <= end_date)
+            .order_by(PaymentOut.date.desc(), PaymentOut.created_at.desc())
+            .execution_options(yield_per=500)
+        )
+        return [payment async for payment in result.scalars()]
+
+    @staticmethod
+    async def delete_by_message_id(
+        session: AsyncSession,
+        message_id: int,
+        chat_id: int,
+    ) -> PaymentOut | None:
+        """Delete outgoing payment by message_id and chat_id. Returns deleted payment or None."""
+        result = await session.execute(
+            select(PaymentOut)
+            .where(PaymentOut.message_id == message_id)
+            .where(PaymentOut.chat_id == chat_id)
+        )
+        payment = result.scalar_one_or_none()
+        if payment:
+            await session.delete(payment)
+            await session.commit()
+        return payment
@@ -0,0 +1,55 @@
+"""
+Migration: Add composite index on (date, created_at) to payments_in and payments_out.
+
+The report queries filter on `date` and sort by `(date DESC, created_at DESC)`;
+without an index SQLite table-scans and sorts on every report button press.
+
+Safe to run multiple times — uses CREATE INDEX IF NOT EXISTS.
+
+Usage:
+    python -m bot.database.migrate_add_indexes
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from sqlalchemy import text
+
+from bot.config import get_settings
+from bot.database.models import Database
+
+INDEXES = {
+    "payments_in": "ix_payments_in_date_created",
+    "payments_out": "ix_payments_out_date_created",
+}
+
+
+async def main():
+    print("=" * 60)
+    print("Migration: Add index on (date, created_at)")
+    print("=" * 60)
+
+    db = Database(get_settings().database_url)
+
+    async with db.engine.begin() as conn:
+        for table, index_name in INDEXES.items():
+            await conn.execute(text(f"""
+                CREATE INDEX IF NOT EXISTS {index_name}
+                ON {table} (date, created_at)
+            """))
+            print(f"  [{table}] Created index '{index_name}' (or it already existed)")
+
+    await db.close()
+
+    print("\n✅ Migration completed successfully!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
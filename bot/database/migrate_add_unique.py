@@ -22,7 +22,7 @@ if str(PROJECT_ROOT) not in sys.path:
 
 from sqlalchemy import text
 
-from bot.config import settings
+from bot.config import get_settings
 from bot.database.models import Database
 
 
@@ -82,7 +82,7 @@ async def main():
     print("Migration: Add UNIQUE(message_id, chat_id)")
     print("=" * 60)
 
-    db = Database(settings.database_url)
+    db = Database(get_settings().database_url)
 
     async with db.engine.begin() as conn:
         # Wrap in a raw connection for direct SQL
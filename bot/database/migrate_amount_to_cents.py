@@ -0,0 +1,68 @@
+"""
+Migration: Convert `amount` columns from float currency units to integer cents.
+
+The models now store amounts as scaled integers (cents) so sums are exact
+and formatting avoids IEEE754 artifacts.
+
+NOT safe to run twice — running it on an already-converted database would
+scale the amounts by another factor of 100. Tables whose amounts are all
+integral are therefore skipped (they look already converted); pass --force
+to convert them anyway. Back up the database first either way.
+
+Usage:
+    python -m bot.database.migrate_amount_to_cents [--force]
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add project root to path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from sqlalchemy import text
+
+from bot.config import get_settings
+from bot.database.models import Database
+
+TABLES = ["payments_in", "payments_out"]
+
+
+async def main(force: bool = False):
+    print("=" * 60)
+    print("Migration: Convert amount to integer cents")
+    print("=" * 60)
+
+    db = Database(get_settings().database_url)
+
+    async with db.engine.begin() as conn:
+        for table in TABLES:
+            # Heuristic guard against double conversion: fractional amounts
+            # can only exist before the conversion.
+            result = await conn.execute(text(f"""
+                SELECT COUNT(*) FROM {table} WHERE amount != CAST(amount AS INTEGER)
+            """))
+            fractional = result.scalar_one()
+            result = await conn.execute(text(f"SELECT COUNT(*) FROM {table}"))
+            total = result.scalar_one()
+
+            if total and not fractional and not force:
+                print(f"  [{table}] Amounts already integral — looks converted, "
+                      f"skipping. Re-run with --force to convert anyway.")
+                continue
+
+            await conn.execute(text(f"""
+                UPDATE {table} SET amount = CAST(ROUND(amount * 100) AS INTEGER)
+            """))
+            print(f"  [{table}] Converted {total} row(s) to cents")
+
+    await db.close()
+
+    print("\n✅ Migration completed successfully!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(force="--force" in sys.argv[1:]))
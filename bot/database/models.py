@@ -1,81 +1,207 @@
-from datetime import datetime, date
-from enum import Enum
-
-from sqlalchemy import BigInteger, Date, DateTime, Float, String, UniqueConstraint, func
-from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-
-
-class ChatType(str, Enum):
-    RU = "ru"
-    ENG = "eng"
-
-
-class Base(AsyncAttrs, DeclarativeBase):
-    pass
-
-
-class PaymentIn(Base):
-    """Incoming payments (pay-in)."""
-
-    __tablename__ = "payments_in"
-    __table_args__ = (
-        UniqueConstraint("message_id", "chat_id", name="uq_payments_in_message_chat"),
-    )
-
-    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    date: Mapped[date] = mapped_column(Date, nullable=False)
-    amount: Mapped[float] = mapped_column(Float, nullable=False)
-    client: Mapped[str] = mapped_column(String(255), nullable=False)
-    teacher: Mapped[str] = mapped_column(String(255), nullable=False)
-    chat_type: Mapped[str] = mapped_column(String(10), nullable=False)  # ru or eng
-    message_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
-    chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
-    created_at: Mapped[datetime] = mapped_column(
-        DateTime, server_default=func.now(), nullable=False
-    )
-
-    def __repr__(self) -> str:
-        return f"<PaymentIn {self.id}: {self.amount} from {self.client}>"
-
-
-class PaymentOut(Base):
-    """Outgoing payments (pay-out)."""
-
-    __tablename__ = "payments_out"
-    __table_args__ = (
-        UniqueConstraint("message_id", "chat_id", name="uq_payments_out_message_chat"),
-    )
-
-    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    date: Mapped[date] = mapped_column(Date, nullable=False)
-    amount: Mapped[float] = mapped_column(Float, nullable=False)
-    category: Mapped[str] = mapped_column(String(255), nullable=False)
-    recipient: Mapped[str] = mapped_column(String(255), nullable=False)
-    message_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
-    chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
-    created_at: Mapped[datetime] = mapped_column(
-        DateTime, server_default=func.now(), nullable=False
-    )
-
-    def __repr__(self) -> str:
-        return f"<PaymentOut {self.id}: {self.amount} to {self.recipient}>"
-
-
-class Database:
-    """Database connection manager."""
-
-    def __init__(self, url: str):
-        self.engine = create_async_engine(url, echo=False)
-        self.session_factory = async_sessionmaker(
-            self.engine, expire_on_commit=False
-        )
-
-    async def create_tables(self):
-        """Create all tables."""
-        async with self.engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
-
-    async def close(self):
-        """Close database connection."""
-        await self.engine.dispose()
+import asyncio
+import logging
+from datetime import datetime, date
+from enum import Enum
+
+from sqlalchemy import (
+    BigInteger,
+    Date,
+    DateTime,
+    Index,
+    String,
+    UniqueConstraint,
+    event,
+    func,
+    insert,
+)
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
+
+
+class ChatType(str, Enum):
+    RU = "ru"
+    ENG = "eng"
+
+
+class Base(AsyncAttrs, DeclarativeBase):
+    pass
+
+
+class PaymentIn(Base):
+    """Incoming payments (pay-in)."""
+
+    __tablename__ = "payments_in"
+    __table_args__ = (
+        UniqueConstraint("message_id", "chat_id", name="uq_payments_in_message_chat"),
+        Index("ix_payments_in_date_created", "date", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    date: Mapped[date] = mapped_column(Date, nullable=False)
+    amount: Mapped[int] = mapped_column(BigInteger, nullable=False)  # cents
+    client: Mapped[str] = mapped_column(String(255), nullable=False)
+    teacher: Mapped[str] = mapped_column(String(255), nullable=False)
+    chat_type: Mapped[str] = mapped_column(String(10), nullable=False)  # ru or eng
+    message_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<PaymentIn {self.id}: {self.amount / 100:.2f} from {self.client}>"
+
+
+class PaymentOut(Base):
+    """Outgoing payments (pay-out)."""
+
+    __tablename__ = "payments_out"
+    __table_args__ = (
+        UniqueConstraint("message_id", "chat_id", name="uq_payments_out_message_chat"),
+        Index("ix_payments_out_date_created", "date", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    date: Mapped[date] = mapped_column(Date, nullable=False)
+    amount: Mapped[int] = mapped_column(BigInteger, nullable=False)  # cents
+    category: Mapped[str] = mapped_column(String(255), nullable=False)
+    recipient: Mapped[str] = mapped_column(String(255), nullable=False)
+    message_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<PaymentOut {self.id}: {self.amount / 100:.2f} to {self.recipient}>"
+
+
+class Database:
+    """Database connection manager."""
+
+    # Debounce window and batch cap for the background insert writer.
+    FLUSH_INTERVAL = 0.05
+    FLUSH_MAX_BATCH = 100
+
+    def __init__(self, url: str):
+        self._insert_queue: asyncio.Queue[tuple[type[Base], dict, asyncio.Future]] = (
+            asyncio.Queue()
+        )
+        self._writer_task: asyncio.Task | None = None
+        pool_kwargs = {}
+        if make_url(url).database != ":memory:":
+            # SQLAlchemy defaults to NullPool for aiosqlite, reopening the
+            # database file (and losing its page cache) on every session.
+            pool_kwargs = {
+                "poolclass": AsyncAdaptedQueuePool,
+                "pool_size": 5,
+                "max_overflow": 10,
+                "pool_pre_ping": True,
+                "pool_recycle": 3600,
+            }
+        self.engine = create_async_engine(url, echo=False, **pool_kwargs)
+        event.listens_for(self.engine.sync_engine, "connect")(self._on_connect)
+        self.session_factory = async_sessionmaker(
+            self.engine, expire_on_commit=False
+        )
+
+    @staticmethod
+    def _on_connect(dbapi_connection, connection_record):
+        """Tune each new SQLite connection for the bot's workload.
+
+        WAL + synchronous=NORMAL speed up the frequent tiny inserts from
+        message handlers; the larger in-memory cache helps the report scans.
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-64000")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.close()
+
+    async def create_tables(self):
+        """Create all tables."""
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    def start_writer(self):
+        """Start the background task that flushes queued inserts in batches."""
+        if self._writer_task is None:
+            self._writer_task = asyncio.get_running_loop().create_task(
+                self._write_loop()
+            )
+
+    async def enqueue_insert(self, model: type["Base"], values: dict) -> bool:
+        """Queue an insert and wait for the batched commit.
+
+        Inserts queued within the debounce window share a single
+        transaction (one fsync for the whole burst). Returns True if the
+        row was inserted, False if it was a duplicate
+        (same message_id + chat_id).
+        """
+        if self._writer_task is None:
+            self.start_writer()
+        future = asyncio.get_running_loop().create_future()
+        self._insert_queue.put_nowait((model, values, future))
+        return await future
+
+    async def _write_loop(self):
+        while True:
+            batch = [await self._insert_queue.get()]
+            try:
+                # Debounce: let a burst accumulate before committing.
+                await asyncio.sleep(self.FLUSH_INTERVAL)
+            except asyncio.CancelledError:
+                await self._flush(batch)
+                raise
+            while len(batch) < self.FLUSH_MAX_BATCH and not self._insert_queue.empty():
+                batch.append(self._insert_queue.get_nowait())
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple[type["Base"], dict, asyncio.Future]]):
+        """Run one transaction for a batch of queued inserts."""
+        try:
+            inserted_flags = []
+            async with self.session_factory() as session:
+                for model, values, _ in batch:
+                    stmt = insert(model).values(**values).prefix_with("OR IGNORE")
+                    result = await session.execute(stmt)
+                    if result.rowcount == 0:
+                        logger.warning(
+                            "Duplicate %s skipped: message_id=%s, chat_id=%s",
+                            model.__name__,
+                            values.get("message_id"),
+                            values.get("chat_id"),
+                        )
+                    inserted_flags.append(result.rowcount > 0)
+                await session.commit()
+        except Exception as exc:
+            logger.exception("Batched insert flush failed")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, _, future), inserted in zip(batch, inserted_flags):
+            if not future.done():
+                future.set_result(inserted)
+
+    async def close(self):
+        """Flush pending inserts, stop the writer and close the connections."""
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+        leftover = []
+        while not self._insert_queue.empty():
+            leftover.append(self._insert_queue.get_nowait())
+        if leftover:
+            await self._flush(leftover)
+        await self.engine.dispose()
@@ -1,390 +1,359 @@
-import re
-from dataclasses import dataclass
-from datetime import datetime
-
-from aiogram import F, Router
-from aiogram.types import Message, ReactionTypeEmoji
-
-from bot.config import settings
-from bot.database.crud import PaymentInCRUD, PaymentOutCRUD
-from bot.database.models import Database
-
-router = Router(name="chat_parser")
-
-
-@dataclass
-class ParseResult:
-    """Result of parsing a message."""
-    success: bool
-    data: dict | None = None
-    error: str | None = None
-
-
-def parse_date(date_str: str) -> datetime.date:
-    """Parse date from various formats."""
-    date_str = date_str.strip()
-    
-    formats = [
-        "%d.%m.%Y",  # 01.02.2026
-        "%d.%m.%y",  # 01.02.26
-        "%Y-%m-%d",  # 2026-02-01
-        "%d/%m/%Y",  # 01/02/2026
-        "%d-%m-%Y",  # 01-02-2026
-    ]
-    
-    for fmt in formats:
-        try:
-            return datetime.strptime(date_str, fmt).date()
-        except ValueError:
-            continue
-    
-    return None
-
-
-def parse_amount(amount_str: str) -> float | None:
-    """Parse amount from string."""
-    cleaned = re.sub(r"[^\d.,]", "", amount_str.strip())
-    
-    if "," in cleaned and "." in cleaned:
-        cleaned = cleaned.replace(",", "")
-    elif "," in cleaned:
-        cleaned = cleaned.replace(",", ".")
-    
-    try:
-        return float(cleaned)
-    except ValueError:
-        return None
-
-
-def parse_payin_message(text: str) -> ParseResult:
-    """
-    Parse pay-in message format:
-    date: 01.02.2026
-    amount: 5000
-    client: Ivanov
-    teacher: Petrov
-    """
-    patterns = {
-        "date": (r"(?:дата|date)\s*[:\-]\s*(.+)", "date"),
-        "amount": (r"(?:сумма|amount|sum)\s*[:\-]\s*(.+)", "amount"),
-        "client": (r"(?:клиент|client)\s*[:\-]\s*(.+)", "client"),
-        "to": (r"(?:преподаватель|teacher|to)\s*[:\-]\s*(.+)", "to"),
-    }
-    
-    result = {}
-    missing_fields = []
-    text_lower = text.lower()
-    
-    for key, (pattern, field_name) in patterns.items():
-        match = re.search(pattern, text_lower, re.IGNORECASE | re.MULTILINE)
-        if match:
-            result[key] = match.group(1).strip()
-        else:
-            missing_fields.append(field_name)
-    
-    # Check for missing fields
-    if missing_fields:
-        return ParseResult(
-            success=False,
-            error=f"❌ Missing fields: {', '.join(missing_fields)}"
-        )
-    
-    # Validate date
-    parsed_date = parse_date(result["date"])
-    if not parsed_date:
-        return ParseResult(
-            success=False,
-            error=f"❌ Invalid date format: {result['date']}\nExpected: DD.MM.YYYY"
-        )
-    
-    # Validate amount
-    parsed_amount = parse_amount(result["amount"])
-    if not parsed_amount:
-        return ParseResult(
-            success=False,
-            error=f"❌ Invalid amount format: {result['amount']}"
-        )
-    
-    # Get original case values
-    for key in ["client", "to"]:
-        pattern, _ = patterns[key]
-        match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
-        if match:
-            result[key] = match.group(1).strip()
-    
-    return ParseResult(
-        success=True,
-        data={
-            "date": parsed_date,
-            "amount": parsed_amount,
-            "client": result["client"],
-            "teacher": result["to"],
-        }
-    )
-
-
-def parse_payout_message(text: str) -> ParseResult:
-    """
-    Parse pay-out message format:
-    date: 01.02.2026
-    amount: 3000
-    category: Salary
-    to: Sidorov
-    """
-    patterns = {
-        "date": (r"(?:дата|date)\s*[:\-]\s*(.+)", "date"),
-        "amount": (r"(?:сумма|amount|sum)\s*[:\-]\s*(.+)", "amount"),
-        "category": (r"(?:категория|category)\s*[:\-]\s*(.+)", "category"),
-        "to": (r"(?:кому|to)\s*[:\-]\s*(.+)", "to"),
-    }
-    
-    result = {}
-    missing_fields = []
-    text_lower = text.lower()
-    
-    for key, (pattern, field_name) in patterns.items():
-        match = re.search(pattern, text_lower, re.IGNORECASE | re.MULTILINE)
-        if match:
-            result[key] = match.group(1).strip()
-        else:
-            missing_fields.append(field_name)
-    
-    # Check for missing fields
-    if missing_fields:
-        return ParseResult(
-            success=False,
-            error=f"❌ Missing fields: {', '.join(missing_fields)}"
-        )
-    
-    # Validate date
-    parsed_date = parse_date(result["date"])
-    if not parsed_date:
-        return ParseResult(
-            success=False,
-            error=f"❌ Invalid date format: {result['date']}\nExpected: DD.MM.YYYY"
-        )
-    
-    # Validate amount
-    parsed_amount = parse_amount(result["amount"])
-    if not parsed_amount:
-        return ParseResult(
-            success=False,
-            error=f"❌ Invalid amount format: {result['amount']}"
-        )
-    
-    # Get original case values
-    for key in ["category", "to"]:
-        pattern, _ = patterns[key]
-        match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
-        if match:
-            result[key] = match.group(1).strip()
-    
-    return ParseResult(
-        success=True,
-        data={
-            "date": parsed_date,
-            "amount": parsed_amount,
-            "category": result["category"],
-            "recipient": result["to"],
-        }
-    )
-
-
-def looks_like_payment_message(text: str) -> bool:
-    """Check if message looks like a payment record (has at least 2 relevant fields)."""
-    keywords = [
-        r"(?:дата|date)\s*[:\-]",
-        r"(?:сумма|amount|sum)\s*[:\-]",
-        r"(?:клиент|client)\s*[:\-]",
-        r"(?:преподаватель|teacher|to)\s*[:\-]",
-        r"(?:категория|category)\s*[:\-]",
-        r"(?:кому|recipient|to)\s*[:\-]",
-    ]
-    matches = sum(1 for kw in keywords if re.search(kw, text, re.IGNORECASE))
-    return matches >= 2
-
-
-async def add_success_reaction(message: Message):
-    """Add success reaction to message."""
-    try:
-        await message.react([ReactionTypeEmoji(emoji="👍")])
-    except Exception as ex:
-        # Reaction might fail if bot doesn't have permission
-        print(ex)
-
-
-async def add_cancel_reaction(message: Message):
-    """Add cancel reaction to the original message."""
-    try:
-        await message.react([ReactionTypeEmoji(emoji="👎")])
-    except Exception as ex:
-        # Reaction might fail if bot doesn't have permission
-        print(ex)
-
-
-def is_cancel_command(text: str) -> bool:
-    """Check if message is a cancel command."""
-    return text.strip().lower() == "cancel"
-
-
-@router.message(
-    F.chat.id.in_([settings.ru_payin_chat_id, settings.eng_payin_chat_id]),
-    F.reply_to_message,
-    F.text,
-)
-async def handle_payin_cancel(message: Message, db: Database):
-    """Handle cancel command for pay-in chats."""
-    if not message.text or not is_cancel_command(message.text):
-        return
-    
-    if not message.reply_to_message:
-        return
-    
-    reply_message_id = message.reply_to_message.message_id
-    chat_id = message.chat.id
-    
-    async with db.session_factory() as session:
-        deleted = await PaymentInCRUD.delete_by_message_id(
-            session=session,
-            message_id=reply_message_id,
-            chat_id=chat_id,
-        )
-    
-    if deleted:
-        await add_cancel_reaction(message.reply_to_message)
-        await message.reply(
-            f"✅ Transaction cancelled:\n"
-            f"Amount: {deleted.amount:,.2f}\n"
-            f"Client: {deleted.client}\n"
-            f"Teacher: {deleted.teacher}"
-        )
-    else:
-        await message.reply("❌ Transaction not found in database")
-
-
-@router.message(
-    F.chat.id == settings.payout_chat_id,
-    F.reply_to_message,
-    F.text,
-)
-async def handle_payout_cancel(message: Message, db: Database):
-    """Handle cancel command for pay-out chat."""
-    if not message.text or not is_cancel_command(message.text):
-        return
-    
-    if not message.reply_to_message:
-        return
-    
-    reply_message_id = message.reply_to_message.message_id
-    chat_id = message.chat.id
-    
-    async with db.session_factory() as session:
-        deleted = await PaymentOutCRUD.delete_by_message_id(
-            session=session,
-            message_id=reply_message_id,
-            chat_id=chat_id,
-        )
-    
-    if deleted:
-        await add_cancel_reaction(message.reply_to_message)
-        await message.reply(
-            f"✅ Transaction cancelled:\n"
-            f"Amount: {deleted.amount:,.2f}\n"
-            f"Category: {deleted.category}\n"
-            f"Recipient: {deleted.recipient}"
-        )
-    else:
-        await message.reply("❌ Transaction not found in database")
-
-
-@router.message(F.chat.id == settings.ru_payin_chat_id)
-async def handle_ru_payin(message: Message, db: Database):
-    """Handle messages from RU pay-in chat."""
-    if not message.text:
-        return
-    
-    # Skip messages that don't look like payment records
-    if not looks_like_payment_message(message.text):
-        return
-    
-    parsed = parse_payin_message(message.text)
-    
-    if not parsed.success:
-        await message.reply(parsed.error)
-        return
-    
-    async with db.session_factory() as session:
-        payment = await PaymentInCRUD.create(
-            session=session,
-            payment_date=parsed.data["date"],
-            amount=parsed.data["amount"],
-            client=parsed.data["client"],
-            teacher=parsed.data["teacher"],
-            chat_type="ru",
-            message_id=message.message_id,
-            chat_id=message.chat.id,
-        )
-    
-    if payment:
-        await add_success_reaction(message)
-
-
-@router.message(F.chat.id == settings.eng_payin_chat_id)
-async def handle_eng_payin(message: Message, db: Database):
-    """Handle messages from ENG pay-in chat."""
-    if not message.text:
-        return
-    
-    if not looks_like_payment_message(message.text):
-        return
-    
-    parsed = parse_payin_message(message.text)
-    
-    if not parsed.success:
-        await message.reply(parsed.error)
-        return
-    
-    async with db.session_factory() as session:
-        payment = await PaymentInCRUD.create(
-            session=session,
-            payment_date=parsed.data["date"],
-            amount=parsed.data["amount"],
-            client=parsed.data["client"],
-            teacher=parsed.data["teacher"],
-            chat_type="eng",
-            message_id=message.message_id,
-            chat_id=message.chat.id,
-        )
-    
-    if payment:
-        await add_success_reaction(message)
-
-
-@router.message(F.chat.id == settings.payout_chat_id)
-async def handle_payout(message: Message, db: Database):
-    """Handle messages from pay-out chat."""
-    if not message.text:
-        return
-    
-    if not looks_like_payment_message(message.text):
-        return
-    
-    parsed = parse_payout_message(message.text)
-    
-    if not parsed.success:
-        await message.reply(parsed.error)
-        return
-    
-    async with db.session_factory() as session:
-        payment = await PaymentOutCRUD.create(
-            session=session,
-            payment_date=parsed.data["date"],
-            amount=parsed.data["amount"],
-            category=parsed.data["category"],
-            recipient=parsed.data["recipient"],
-            message_id=message.message_id,
-            chat_id=message.chat.id,
-        )
-    
-    if payment:
-        await add_success_reaction(message)
+import asyncio
+import logging
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from aiogram import F, Router
+from aiogram.types import Message, ReactionTypeEmoji
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.config import get_settings
+from bot.database.crud import PaymentInCRUD, PaymentOutCRUD
+from bot.database.models import Database, PaymentIn, PaymentOut
+from bot.services.money import format_cents, to_cents
+
+logger = logging.getLogger(__name__)
+
+router = Router(name="chat_parser")
+
+# Chat IDs are baked into the router filters, so resolve settings here.
+settings = get_settings()
+
+
+@dataclass(slots=True)
+class ParseResult:
+    """Result of parsing a message."""
+    success: bool
+    data: dict | None = None
+    error: str | None = None
+
+
+# Patterns are compiled once at import; handlers run them on every
+# message in the monitored chats.
+_FIELD_FLAGS = re.IGNORECASE | re.MULTILINE
+
+# One pattern per message format: any field keyword with its value,
+# extracted in a single pass over the text. The key map folds keyword
+# spellings into canonical field names.
+_PAYIN_LINE_RE = re.compile(
+    r"(?P<key>дата|date|сумма|amount|sum|клиент|client"
+    r"|преподаватель|teacher|to)\s*[:\-]\s*(?P<val>.+)",
+    _FIELD_FLAGS,
+)
+_PAYIN_KEY_MAP = {
+    "дата": "date", "date": "date",
+    "сумма": "amount", "amount": "amount", "sum": "amount",
+    "клиент": "client", "client": "client",
+    "преподаватель": "to", "teacher": "to", "to": "to",
+}
+_PAYIN_REQUIRED = ("date", "amount", "client", "to")
+
+_PAYOUT_LINE_RE = re.compile(
+    r"(?P<key>дата|date|сумма|amount|sum|категория|category"
+    r"|кому|to)\s*[:\-]\s*(?P<val>.+)",
+    _FIELD_FLAGS,
+)
+_PAYOUT_KEY_MAP = {
+    "дата": "date", "date": "date",
+    "сумма": "amount", "amount": "amount", "sum": "amount",
+    "категория": "category", "category": "category",
+    "кому": "to", "to": "to",
+}
+_PAYOUT_REQUIRED = ("date", "amount", "category", "to")
+
+# All field keywords in one alternation, so the pre-filter scans the
+# message once instead of once per keyword.
+_PAYMENT_HINT_RE = re.compile(
+    r"(?:дата|date|сумма|amount|sum|клиент|client"
+    r"|преподаватель|teacher|to|категория|category|кому|recipient)\s*[:\-]",
+    re.IGNORECASE,
+)
+
+_AMOUNT_JUNK = re.compile(r"[^\d.,]")
+
+# Covers 01.02.2026, 01.02.26, 2026-02-01, 01/02/2026, 01-02-2026.
+_DATE_RE = re.compile(r"^\s*(\d{1,4})[.\-/](\d{1,2})[.\-/](\d{1,4})\s*$")
+
+# Cheap substring gate that rejects most chat noise before the regex
+# pre-filter runs; a payment record always mentions one of these.
+_PREFILTER = ("дата", "date", "сумма", "amount")
+
+
+def parse_date(date_str: str) -> datetime.date:
+    """Parse date from various formats."""
+    match = _DATE_RE.match(date_str)
+    if not match:
+        return None
+
+    first, middle, last = match.groups()
+    if len(first) == 4:
+        # Year first: 2026-02-01
+        year, month, day = int(first), int(middle), int(last)
+    else:
+        # Day first: 01.02.2026 / 01.02.26
+        day, month, year = int(first), int(middle), int(last)
+    if year < 100:
+        # Same century pivot strptime's %y uses: 68 -> 2068, 69 -> 1969.
+        year += 2000 if year < 69 else 1900
+
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def parse_amount(amount_str: str) -> float | None:
+    """Parse amount from string."""
+    amount_str = amount_str.strip()
+
+    # Fast path: plain digit amounts ("5000") need no cleaning.
+    if amount_str.isdigit():
+        return float(amount_str)
+
+    cleaned = _AMOUNT_JUNK.sub("", amount_str)
+    
+    if "," in cleaned and "." in cleaned:
+        cleaned = cleaned.replace(",", "")
+    elif "," in cleaned:
+        cleaned = cleaned.replace(",", ".")
+    
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def parse_payin_message(text: str) -> ParseResult:
+    """
+    Parse pay-in message format:
+    date: 01.02.2026
+    amount: 5000
+    client: Ivanov
+    teacher: Petrov
+    """
+    result = {}
+
+    # One pass over the text; the first occurrence of each field wins.
+    for match in _PAYIN_LINE_RE.finditer(text):
+        key = _PAYIN_KEY_MAP[match["key"].lower()]
+        if key not in result:
+            result[key] = match["val"].strip()
+
+    missing_fields = [key for key in _PAYIN_REQUIRED if key not in result]
+    
+    # Check for missing fields
+    if missing_fields:
+        return ParseResult(
+            success=False,
+            error=f"❌ Missing fields: {', '.join(missing_fields)}"
+        )
+    
+    # Validate date
+    parsed_date = parse_date(result["date"])
+    if not parsed_date:
+        return ParseResult(
+            success=False,
+            error=f"❌ Invalid date format: {result['date']}\nExpected: DD.MM.YYYY"
+        )
+    
+    # Validate amount
+    parsed_amount = parse_amount(result["amount"])
+    if not parsed_amount:
+        return ParseResult(
+            success=False,
+            error=f"❌ Invalid amount format: {result['amount']}"
+        )
+    
+    return ParseResult(
+        success=True,
+        data={
+            "date": parsed_date,
+            "amount": parsed_amount,
+            "client": result["client"],
+            "teacher": result["to"],
+        }
+    )
+
+
+def parse_payout_message(text: str) -> ParseResult:
+    """
+    Parse pay-out message format:
+    date: 01.02.2026
+    amount: 3000
+    category: Salary
+    to: Sidorov
+    """
+    result = {}
+
+    for match in _PAYOUT_LINE_RE.finditer(text):
+        key = _PAYOUT_KEY_MAP[match["key"].lower()]
+        if key not in result:
+            result[key] = match["val"].strip()
+
+    missing_fields = [key for key in _PAYOUT_REQUIRED if key not in result]
+    
+    # Check for missing fields
+    if missing_fields:
+        return ParseResult(
+            success=False,
+            error=f"❌ Missing fields: {', '.join(missing_fields)}"
+        )
+    
+    # Validate date
+    parsed_date = parse_date(result["date"])
+    if not parsed_date:
+        return ParseResult(
+            success=False,
+            error=f"❌ Invalid date format: {result['date']}\nExpected: DD.MM.YYYY"
+        )
+    
+    # Validate amount
+    parsed_amount = parse_amount(result["amount"])
+    if not parsed_amount:
+        return ParseResult(
+            success=False,
+            error=f"❌ Invalid amount format: {result['amount']}"
+        )
+    
+    return ParseResult(
+        success=True,
+        data={
+            "date": parsed_date,
+            "amount": parsed_amount,
+            "category": result["category"],
+            "recipient": result["to"],
+        }
+    )
+
+
+def looks_like_payment_message(text: str) -> bool:
+    """Check if message looks like a payment record (has at least 2 relevant fields)."""
+    text_lower = text.lower()
+    if not any(keyword in text_lower for keyword in _PREFILTER):
+        return False
+
+    matches = 0
+    for _ in _PAYMENT_HINT_RE.finditer(text):
+        matches += 1
+        if matches >= 2:
+            return True
+    return False
+
+
+# Chats where reacting has already failed (usually missing permission);
+# skip the API round trip for them instead of failing on every message.
+_NO_REACT_CHATS: set[int] = set()
+
+# Keep strong references to detached reaction tasks so the event loop
+# doesn't garbage-collect them mid-flight.
+_BG_TASKS: set[asyncio.Task] = set()
+
+
+def _spawn_reaction(coro) -> None:
+    """Fire a reaction in the background; the handler need not wait for it."""
+    task = asyncio.create_task(coro)
+    _BG_TASKS.add(task)
+    task.add_done_callback(_BG_TASKS.discard)
+
+
+async def _react(message: Message, emoji: str):
+    """React to a message, remembering chats where reactions fail."""
+    if message.chat.id in _NO_REACT_CHATS:
+        return
+    try:
+        await message.react([ReactionTypeEmoji(emoji=emoji)])
+    except Exception as ex:
+        _NO_REACT_CHATS.add(message.chat.id)
+        logger.warning("Reactions disabled for chat %s: %s", message.chat.id, ex)
+
+
+async def add_success_reaction(message: Message):
+    """Add success reaction to message."""
+    await _react(message, "👍")
+
+
+async def add_cancel_reaction(message: Message):
+    """Add cancel reaction to the original message."""
+    await _react(message, "👎")
+
+
+def is_cancel_command(text: str) -> bool:
+    """Check if message is a cancel command."""
+    return text.strip().lower() == "cancel"
+
+
+# chat_id -> (model, CRUD, parser, chat_type). One router filter covers
+# all monitored chats; the dict picks the branch in O(1).
+_CHAT_ROUTING = {
+    settings.ru_payin_chat_id: (PaymentIn, PaymentInCRUD, parse_payin_message, "ru"),
+    settings.eng_payin_chat_id: (PaymentIn, PaymentInCRUD, parse_payin_message, "eng"),
+    settings.payout_chat_id: (PaymentOut, PaymentOutCRUD, parse_payout_message, None),
+}
+
+
+@router.message(F.chat.id.in_(set(_CHAT_ROUTING)))
+async def handle_chat_message(message: Message, db: Database, session: AsyncSession):
+    """Handle messages from the monitored chats: cancel or record a payment."""
+    if not message.text:
+        return
+
+    model, crud, parser, chat_type = _CHAT_ROUTING[message.chat.id]
+
+    # A "cancel" reply removes the replied-to record.
+    if message.reply_to_message and is_cancel_command(message.text):
+        deleted = await crud.delete_by_message_id(
+            session=session,
+            message_id=message.reply_to_message.message_id,
+            chat_id=message.chat.id,
+        )
+
+        if not deleted:
+            await message.reply("❌ Transaction not found in database")
+            return
+
+        _spawn_reaction(add_cancel_reaction(message.reply_to_message))
+        if model is PaymentIn:
+            await message.reply(
+                f"✅ Transaction cancelled:\n"
+                f"Amount: {format_cents(deleted.amount)}\n"
+                f"Client: {deleted.client}\n"
+                f"Teacher: {deleted.teacher}"
+            )
+        else:
+            await message.reply(
+                f"✅ Transaction cancelled:\n"
+                f"Amount: {format_cents(deleted.amount)}\n"
+                f"Category: {deleted.category}\n"
+                f"Recipient: {deleted.recipient}"
+            )
+        return
+
+    # Skip messages that don't look like payment records
+    if not looks_like_payment_message(message.text):
+        return
+
+    parsed = parser(message.text)
+
+    if not parsed.success:
+        await message.reply(parsed.error)
+        return
+
+    values = {
+        "date": parsed.data["date"],
+        "amount": to_cents(parsed.data["amount"]),
+        "message_id": message.message_id,
+        "chat_id": message.chat.id,
+    }
+    if model is PaymentIn:
+        values["client"] = parsed.data["client"]
+        values["teacher"] = parsed.data["teacher"]
+        values["chat_type"] = chat_type
+    else:
+        values["category"] = parsed.data["category"]
+        values["recipient"] = parsed.data["recipient"]
+
+    inserted = await db.enqueue_insert(model, values)
+
+    if inserted:
+        _spawn_reaction(add_success_reaction(message))
@@ -1,82 +1,111 @@
-import asyncio
-import logging
-import sys
-from pathlib import Path
-
-# Add project root to path for direct execution
-PROJECT_ROOT = Path(__file__).resolve().parent.parent
-if str(PROJECT_ROOT) not in sys.path:
-    sys.path.insert(0, str(PROJECT_ROOT))
-
-from aiogram import Bot, Dispatcher, Router
-from aiogram.client.default import DefaultBotProperties
-from aiogram.enums import ParseMode
-from aiogram.types import Message
-
-from bot.config import settings
-from bot.database.models import Database
-from bot.handlers import admin, chat_parser
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    stream=sys.stdout,
-)
-logger = logging.getLogger(__name__)
-
-
-async def main():
-    """Main entry point."""
-    logger.info("Starting bot...")
-    logger.info(f"Admin IDs: {settings.admin_ids}")
-    logger.info(f"RU Pay-in chat ID: {settings.ru_payin_chat_id}")
-    logger.info(f"ENG Pay-in chat ID: {settings.eng_payin_chat_id}")
-    logger.info(f"Pay-out chat ID: {settings.payout_chat_id}")
-    
-    # Ensure data directory exists
-    data_dir = Path("data")
-    data_dir.mkdir(exist_ok=True)
-    
-    # Initialize database
-    db = Database(settings.database_url)
-    await db.create_tables()
-    logger.info("Database tables created")
-    
-    # Initialize bot with default properties
-    bot = Bot(
-        token=settings.bot_token,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
-    )
-    
-    # Initialize dispatcher
-    dp = Dispatcher()
-    
-    # Debug router - logs all messages (register last to not interfere)
-    debug_router = Router(name="debug")
-    
-    @debug_router.message()
-    async def debug_handler(message: Message):
-        logger.info(
-            f"[DEBUG] Chat ID: {message.chat.id}, "
-            f"Type: {message.chat.type}, "
-            f"From: {message.from_user.id if message.from_user else 'N/A'}, "
-            f"Text: {message.text[:50] if message.text else 'None'}..."
-        )
-    
-    # Register routers
-    dp.include_router(admin.router)
-    dp.include_router(chat_parser.router)
-    dp.include_router(debug_router)  # Last - catches everything else
-    
-    try:
-        logger.info("Bot started successfully")
-        await dp.start_polling(bot, db=db)
-    finally:
-        await db.close()
-        logger.info("Database connection closed")
-        await bot.session.close()
-
-
-if __name__ == "__main__":
-    asyncio.run(main())
+import asyncio
+import logging
+import logging.handlers
+import queue
+import sys
+from pathlib import Path
+
+# Add project root to path for direct execution
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.default import DefaultBotProperties
+from aiogram.enums import ParseMode
+from aiogram.types import Message
+
+from bot.config import get_settings
+from bot.database.models import Database
+from bot.handlers import admin, chat_parser
+from bot.middlewares import DbSessionMiddleware
+
+logger = logging.getLogger(__name__)
+
+
+def setup_logging(debug: bool = False) -> logging.handlers.QueueListener:
+    """Route log records through a queue to a background thread.
+
+    Log calls on the event loop then only pay for a Queue.put;
+    formatting and stdout I/O happen off-loop in the listener thread.
+    """
+    log_queue: queue.Queue = queue.Queue(-1)
+    root = logging.getLogger()
+    root.setLevel(logging.DEBUG if debug else logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(
+        logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    )
+    listener = logging.handlers.QueueListener(
+        log_queue, stream_handler, respect_handler_level=True
+    )
+    listener.start()
+    return listener
+
+
+async def main():
+    """Main entry point."""
+    settings = get_settings()
+    listener = setup_logging(debug=settings.debug)
+    logger.info("Starting bot...")
+    logger.info(f"Admin IDs: {settings.admin_ids}")
+    logger.info(f"RU Pay-in chat ID: {settings.ru_payin_chat_id}")
+    logger.info(f"ENG Pay-in chat ID: {settings.eng_payin_chat_id}")
+    logger.info(f"Pay-out chat ID: {settings.payout_chat_id}")
+    
+    # Ensure data directory exists
+    data_dir = Path("data")
+    data_dir.mkdir(exist_ok=True)
+    
+    # Initialize database
+    db = Database(settings.database_url)
+    await db.create_tables()
+    db.start_writer()
+    logger.info("Database tables created")
+    
+    # Initialize bot with default properties
+    bot = Bot(
+        token=settings.bot_token,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
+    
+    # Initialize dispatcher
+    dp = Dispatcher()
+    
+    # Register routers
+    chat_parser.router.message.middleware(DbSessionMiddleware(db))
+    dp.include_router(admin.router)
+    dp.include_router(chat_parser.router)
+
+    # Debug router - logs all unmatched messages. Only registered when
+    # DEBUG=true, so production dispatch never pays for the catch-all
+    # handler.
+    if settings.debug:
+        debug_router = Router(name="debug")
+
+        @debug_router.message()
+        async def debug_handler(message: Message):
+            logger.debug(
+                "Chat ID: %s, Type: %s, From: %s, Text: %.50s",
+                message.chat.id,
+                message.chat.type,
+                getattr(message.from_user, "id", None),
+                message.text or "",
+            )
+
+        dp.include_router(debug_router)  # Last - catches everything else
+    
+    try:
+        logger.info("Bot started successfully")
+        await dp.start_polling(bot, db=db)
+    finally:
+        await db.close()
+        logger.info("Database connection closed")
+        await bot.session.close()
+        listener.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,4 @@
+from .admin import AdminOnlyMiddleware
+from .db import DbSessionMiddleware
+
+__all__ = ["AdminOnlyMiddleware", "DbSessionMiddleware"]
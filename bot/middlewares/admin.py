@@ -0,0 +1,29 @@
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, TelegramObject
+
+
+class AdminOnlyMiddleware(BaseMiddleware):
+    """Reject updates from non-admins before any handler runs.
+
+    One membership check per update replaces the identical prelude that
+    every admin handler used to carry.
+    """
+
+    def __init__(self, admin_ids: frozenset[int]):
+        self.admin_ids = admin_ids
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user = getattr(event, "from_user", None)
+        if not user or user.id not in self.admin_ids:
+            if isinstance(event, CallbackQuery):
+                await event.answer("⛔ Access denied", show_alert=True)
+            return None
+        return await handler(event, data)
@@ -0,0 +1,30 @@
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.database.models import Database
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """Inject a database session into handlers as the ``session`` kwarg.
+
+    One session covers the whole update instead of each handler opening
+    its own. The session is lazy — SQLAlchemy checks out a connection
+    only on the first query — so updates that never touch the database
+    pay just the object allocation.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        async with self.db.session_factory() as session:
+            data["session"] = session
+            return await handler(event, data)
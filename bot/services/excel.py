@@ -1,479 +1,973 @@
-import io
-from collections import defaultdict
-from datetime import date, timedelta
-
-from openpyxl import Workbook
-from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
-from openpyxl.utils import get_column_letter
-
-from bot.database.models import PaymentIn, PaymentOut
-
-
-class ExcelService:
-    """Service for generating Excel reports."""
-    
-    # Styles
-    HEADER_FONT = Font(bold=True, color="FFFFFF")
-    HEADER_FILL = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    SUBHEADER_FILL = PatternFill(start_color="8EA9DB", end_color="8EA9DB", fill_type="solid")
-    SUCCESS_FILL = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-    WARNING_FILL = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
-    BORDER = Border(
-        left=Side(style="thin"),
-        right=Side(style="thin"),
-        top=Side(style="thin"),
-        bottom=Side(style="thin"),
-    )
-    CENTER_ALIGN = Alignment(horizontal="center", vertical="center")
-    
-    @classmethod
-    def generate_period_report(
-        cls,
-        incoming: list[PaymentIn],
-        outgoing: list[PaymentOut],
-        period_name: str = "Report",
-    ) -> io.BytesIO:
-        """Generate comprehensive Excel report for a given period."""
-        wb = Workbook()
-        
-        # Remove default sheet
-        wb.remove(wb.active)
-        
-        # Create sheets
-        ws_summary = wb.create_sheet("Summary", 0)
-        cls._write_comprehensive_summary(ws_summary, incoming, outgoing, period_name)
-        
-        ws_daily = wb.create_sheet("By Day")
-        cls._write_daily_breakdown(ws_daily, incoming, outgoing)
-        
-        ws_in = wb.create_sheet("Incoming Payments")
-        cls._write_incoming_sheet(ws_in, incoming)
-        
-        ws_out = wb.create_sheet("Outgoing Payments")
-        cls._write_outgoing_sheet(ws_out, outgoing)
-        
-        ws_teachers = wb.create_sheet("By Teacher")
-        cls._write_teachers_breakdown(ws_teachers, incoming)
-        
-        ws_categories = wb.create_sheet("By Category")
-        cls._write_categories_breakdown(ws_categories, outgoing)
-        
-        # Save to bytes
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        
-        return output
-    
-    # Keep old method name for backward compatibility
-    @classmethod
-    def generate_7_days_report(
-        cls,
-        incoming: list[PaymentIn],
-        outgoing: list[PaymentOut],
-    ) -> io.BytesIO:
-        """Generate comprehensive Excel report for the last 7 days."""
-        return cls.generate_period_report(incoming, outgoing, period_name="Last 7 Days")
-    
-    @classmethod
-    def _write_comprehensive_summary(
-        cls,
-        ws,
-        incoming: list[PaymentIn],
-        outgoing: list[PaymentOut],
-        period_name: str = "Report",
-    ):
-        """Write comprehensive summary sheet."""
-        total_in = sum(p.amount for p in incoming)
-        total_out = sum(p.amount for p in outgoing)
-        balance = total_in - total_out
-        
-        # Title
-        ws.cell(row=1, column=1, value=f"FINANCIAL REPORT: {period_name.upper()}")
-        ws.cell(row=1, column=1).font = Font(bold=True, size=16)
-        ws.merge_cells("A1:D1")
-        
-        # Period info
-        if incoming or outgoing:
-            all_dates = [p.date for p in incoming] + [p.date for p in outgoing]
-            start_date = min(all_dates) if all_dates else date.today()
-            end_date = max(all_dates) if all_dates else date.today()
-            ws.cell(row=2, column=1, value=f"Period: {start_date.strftime('%d.%m.%Y')} - {end_date.strftime('%d.%m.%Y')}")
-        else:
-            ws.cell(row=2, column=1, value="Period: No data")
-        ws.merge_cells("A2:D2")
-        
-        ws.cell(row=3, column=1, value=f"Generated: {date.today().strftime('%d.%m.%Y')}")
-        ws.merge_cells("A3:D3")
-        
-        row = 5
-        
-        # Main metrics
-        ws.cell(row=row, column=1, value="KEY METRICS")
-        ws.cell(row=row, column=1).font = Font(bold=True, size=12)
-        ws.merge_cells(f"A{row}:D{row}")
-        row += 1
-        
-        # Incoming section
-        ws.cell(row=row, column=1, value="INCOMING PAYMENTS (DEBIT)")
-        ws.cell(row=row, column=1).font = Font(bold=True)
-        ws.cell(row=row, column=1).fill = cls.SUCCESS_FILL
-        ws.merge_cells(f"A{row}:B{row}")
-        row += 1
-        
-        ws.cell(row=row, column=1, value="Total Amount:")
-        ws.cell(row=row, column=2, value=total_in)
-        ws.cell(row=row, column=2).number_format = '#,##0.00'
-        row += 1
-        
-        ws.cell(row=row, column=1, value="Transaction Count:")
-        ws.cell(row=row, column=2, value=len(incoming))
-        row += 1
-        
-        if incoming:
-            avg_in = total_in / len(incoming)
-            ws.cell(row=row, column=1, value="Average Payment:")
-            ws.cell(row=row, column=2, value=avg_in)
-            ws.cell(row=row, column=2).number_format = '#,##0.00'
-            row += 1
-            
-            max_in = max(p.amount for p in incoming)
-            min_in = min(p.amount for p in incoming)
-            ws.cell(row=row, column=1, value="Max Payment:")
-            ws.cell(row=row, column=2, value=max_in)
-            ws.cell(row=row, column=2).number_format = '#,##0.00'
-            row += 1
-            
-            ws.cell(row=row, column=1, value="Min Payment:")
-            ws.cell(row=row, column=2, value=min_in)
-            ws.cell(row=row, column=2).number_format = '#,##0.00'
-            row += 1
-            
-            # By chat type
-            ru_payments = [p for p in incoming if p.chat_type == "ru"]
-            eng_payments = [p for p in incoming if p.chat_type == "eng"]
-            ws.cell(row=row, column=1, value="From RU chat:")
-            ws.cell(row=row, column=2, value=f"{len(ru_payments)} pcs. for {sum(p.amount for p in ru_payments):,.2f}")
-            row += 1
-            ws.cell(row=row, column=1, value="From ENG chat:")
-            ws.cell(row=row, column=2, value=f"{len(eng_payments)} pcs. for {sum(p.amount for p in eng_payments):,.2f}")
-            row += 1
-        
-        row += 1
-        
-        # Outgoing section
-        ws.cell(row=row, column=1, value="OUTGOING PAYMENTS (CREDIT)")
-        ws.cell(row=row, column=1).font = Font(bold=True)
-        ws.cell(row=row, column=1).fill = cls.WARNING_FILL
-        ws.merge_cells(f"A{row}:B{row}")
-        row += 1
-        
-        ws.cell(row=row, column=1, value="Total Amount:")
-        ws.cell(row=row, column=2, value=total_out)
-        ws.cell(row=row, column=2).number_format = '#,##0.00'
-        row += 1
-        
-        ws.cell(row=row, column=1, value="Transaction Count:")
-        ws.cell(row=row, column=2, value=len(outgoing))
-        row += 1
-        
-        if outgoing:
-            avg_out = total_out / len(outgoing)
-            ws.cell(row=row, column=1, value="Average Payment:")
-            ws.cell(row=row, column=2, value=avg_out)
-            ws.cell(row=row, column=2).number_format = '#,##0.00'
-            row += 1
-            
-            max_out = max(p.amount for p in outgoing)
-            min_out = min(p.amount for p in outgoing)
-            ws.cell(row=row, column=1, value="Max Payment:")
-            ws.cell(row=row, column=2, value=max_out)
-            ws.cell(row=row, column=2).number_format = '#,##0.00'
-            row += 1
-            
-            ws.cell(row=row, column=1, value="Min Payment:")
-            ws.cell(row=row, column=2, value=min_out)
-            ws.cell(row=row, column=2).number_format = '#,##0.00'
-            row += 1
-        
-        row += 1
-        
-        # Balance
-        ws.cell(row=row, column=1, value="TOTAL BALANCE")
-        ws.cell(row=row, column=1).font = Font(bold=True, size=12)
-        ws.cell(row=row, column=2, value=balance)
-        ws.cell(row=row, column=2).font = Font(bold=True, size=12)
-        ws.cell(row=row, column=2).number_format = '#,##0.00'
-        if balance >= 0:
-            ws.cell(row=row, column=2).fill = cls.SUCCESS_FILL
-        else:
-            ws.cell(row=row, column=2).fill = cls.WARNING_FILL
-        
-        ws.column_dimensions["A"].width = 25
-        ws.column_dimensions["B"].width = 30
-    
-    @classmethod
-    def _write_daily_breakdown(
-        cls,
-        ws,
-        incoming: list[PaymentIn],
-        outgoing: list[PaymentOut],
-    ):
-        """Write daily breakdown sheet."""
-        headers = ["Date", "Incoming (count)", "Incoming (amount)", 
-                   "Outgoing (count)", "Outgoing (amount)", "Day Balance"]
-        cls._write_headers(ws, headers)
-        
-        # Group by date
-        in_by_date = defaultdict(list)
-        out_by_date = defaultdict(list)
-        
-        for p in incoming:
-            in_by_date[p.date].append(p)
-        for p in outgoing:
-            out_by_date[p.date].append(p)
-        
-        # Get all dates in range
-        all_dates = set(in_by_date.keys()) | set(out_by_date.keys())
-        if not all_dates:
-            # Show last 7 days even if empty
-            today = date.today()
-            all_dates = {today - timedelta(days=i) for i in range(7)}
-        
-        row = 2
-        total_in = 0
-        total_out = 0
-        
-        for d in sorted(all_dates, reverse=True):
-            day_in = in_by_date.get(d, [])
-            day_out = out_by_date.get(d, [])
-            
-            sum_in = sum(p.amount for p in day_in)
-            sum_out = sum(p.amount for p in day_out)
-            day_balance = sum_in - sum_out
-            
-            total_in += sum_in
-            total_out += sum_out
-            
-            ws.cell(row=row, column=1, value=d.strftime("%d.%m.%Y")).border = cls.BORDER
-            ws.cell(row=row, column=2, value=len(day_in)).border = cls.BORDER
-            ws.cell(row=row, column=3, value=sum_in).border = cls.BORDER
-            ws.cell(row=row, column=3).number_format = '#,##0.00'
-            ws.cell(row=row, column=4, value=len(day_out)).border = cls.BORDER
-            ws.cell(row=row, column=5, value=sum_out).border = cls.BORDER
-            ws.cell(row=row, column=5).number_format = '#,##0.00'
-            ws.cell(row=row, column=6, value=day_balance).border = cls.BORDER
-            ws.cell(row=row, column=6).number_format = '#,##0.00'
-            
-            if day_balance >= 0:
-                ws.cell(row=row, column=6).fill = cls.SUCCESS_FILL
-            else:
-                ws.cell(row=row, column=6).fill = cls.WARNING_FILL
-            
-            row += 1
-        
-        # Total row
-        row += 1
-        ws.cell(row=row, column=1, value="TOTAL").font = Font(bold=True)
-        ws.cell(row=row, column=2, value=len(incoming)).font = Font(bold=True)
-        ws.cell(row=row, column=3, value=total_in).font = Font(bold=True)
-        ws.cell(row=row, column=3).number_format = '#,##0.00'
-        ws.cell(row=row, column=4, value=len(outgoing)).font = Font(bold=True)
-        ws.cell(row=row, column=5, value=total_out).font = Font(bold=True)
-        ws.cell(row=row, column=5).number_format = '#,##0.00'
-        ws.cell(row=row, column=6, value=total_in - total_out).font = Font(bold=True)
-        ws.cell(row=row, column=6).number_format = '#,##0.00'
-        
-        # Adjust widths
-        widths = [12, 18, 18, 18, 18, 15]
-        for col, width in enumerate(widths, start=1):
-            ws.column_dimensions[get_column_letter(col)].width = width
-    
-    @classmethod
-    def _write_teachers_breakdown(cls, ws, incoming: list[PaymentIn]):
-        """Write breakdown by teacher."""
-        headers = ["Teacher", "Count", "Amount", "Average", "% of Total", "First Date", "Last Date"]
-        cls._write_headers(ws, headers)
-        
-        if not incoming:
-            ws.cell(row=2, column=1, value="No data")
-            return
-        
-        # Group by teacher
-        by_teacher = defaultdict(list)
-        for p in incoming:
-            by_teacher[p.teacher].append(p)
-        
-        total_amount = sum(p.amount for p in incoming)
-        
-        # Sort by amount descending
-        sorted_teachers = sorted(
-            by_teacher.items(),
-            key=lambda x: sum(p.amount for p in x[1]),
-            reverse=True
-        )
-        
-        row = 2
-        for teacher, payments in sorted_teachers:
-            total = sum(p.amount for p in payments)
-            avg = total / len(payments)
-            pct = (total / total_amount * 100) if total_amount > 0 else 0
-            dates = [p.date for p in payments]
-            first_date = min(dates)
-            last_date = max(dates)
-            
-            ws.cell(row=row, column=1, value=teacher).border = cls.BORDER
-            ws.cell(row=row, column=2, value=len(payments)).border = cls.BORDER
-            ws.cell(row=row, column=3, value=total).border = cls.BORDER
-            ws.cell(row=row, column=3).number_format = '#,##0.00'
-            ws.cell(row=row, column=4, value=avg).border = cls.BORDER
-            ws.cell(row=row, column=4).number_format = '#,##0.00'
-            ws.cell(row=row, column=5, value=f"{pct:.1f}%").border = cls.BORDER
-            ws.cell(row=row, column=6, value=first_date.strftime("%d.%m.%Y")).border = cls.BORDER
-            ws.cell(row=row, column=7, value=last_date.strftime("%d.%m.%Y")).border = cls.BORDER
-            row += 1
-        
-        # Total
-        row += 1
-        ws.cell(row=row, column=1, value="TOTAL").font = Font(bold=True)
-        ws.cell(row=row, column=2, value=len(incoming)).font = Font(bold=True)
-        ws.cell(row=row, column=3, value=total_amount).font = Font(bold=True)
-        ws.cell(row=row, column=3).number_format = '#,##0.00'
-        
-        widths = [25, 12, 15, 15, 12, 14, 14]
-        for col, width in enumerate(widths, start=1):
-            ws.column_dimensions[get_column_letter(col)].width = width
-    
-    @classmethod
-    def _write_categories_breakdown(cls, ws, outgoing: list[PaymentOut]):
-        """Write breakdown by category."""
-        headers = ["Category", "Count", "Amount", "Average", "% of Total", "First Date", "Last Date"]
-        cls._write_headers(ws, headers)
-        
-        if not outgoing:
-            ws.cell(row=2, column=1, value="No data")
-            return
-        
-        # Group by category
-        by_category = defaultdict(list)
-        for p in outgoing:
-            by_category[p.category].append(p)
-        
-        total_amount = sum(p.amount for p in outgoing)
-        
-        # Sort by amount descending
-        sorted_categories = sorted(
-            by_category.items(),
-            key=lambda x: sum(p.amount for p in x[1]),
-            reverse=True
-        )
-        
-        row = 2
-        for category, payments in sorted_categories:
-            total = sum(p.amount for p in payments)
-            avg = total / len(payments)
-            pct = (total / total_amount * 100) if total_amount > 0 else 0
-            dates = [p.date for p in payments]
-            first_date = min(dates)
-            last_date = max(dates)
-            
-            ws.cell(row=row, column=1, value=category).border = cls.BORDER
-            ws.cell(row=row, column=2, value=len(payments)).border = cls.BORDER
-            ws.cell(row=row, column=3, value=total).border = cls.BORDER
-            ws.cell(row=row, column=3).number_format = '#,##0.00'
-            ws.cell(row=row, column=4, value=avg).border = cls.BORDER
-            ws.cell(row=row, column=4).number_format = '#,##0.00'
-            ws.cell(row=row, column=5, value=f"{pct:.1f}%").border = cls.BORDER
-            ws.cell(row=row, column=6, value=first_date.strftime("%d.%m.%Y")).border = cls.BORDER
-            ws.cell(row=row, column=7, value=last_date.strftime("%d.%m.%Y")).border = cls.BORDER
-            row += 1
-        
-        # Total
-        row += 1
-        ws.cell(row=row, column=1, value="TOTAL").font = Font(bold=True)
-        ws.cell(row=row, column=2, value=len(outgoing)).font = Font(bold=True)
-        ws.cell(row=row, column=3, value=total_amount).font = Font(bold=True)
-        ws.cell(row=row, column=3).number_format = '#,##0.00'
-        
-        widths = [25, 12, 15, 15, 12, 14, 14]
-        for col, width in enumerate(widths, start=1):
-            ws.column_dimensions[get_column_letter(col)].width = width
-    
-    @classmethod
-    def _write_incoming_sheet(cls, ws, payments: list[PaymentIn]):
-        """Write incoming payments to worksheet."""
-        headers = ["#", "Date", "Amount", "Client", "Teacher", "Chat", "Added"]
-        cls._write_headers(ws, headers)
-        
-        for i, payment in enumerate(payments, start=2):
-            ws.cell(row=i, column=1, value=i - 1).border = cls.BORDER
-            ws.cell(row=i, column=2, value=payment.date.strftime("%d.%m.%Y")).border = cls.BORDER
-            ws.cell(row=i, column=3, value=payment.amount).border = cls.BORDER
-            ws.cell(row=i, column=3).number_format = '#,##0.00'
-            ws.cell(row=i, column=4, value=payment.client).border = cls.BORDER
-            ws.cell(row=i, column=5, value=payment.teacher).border = cls.BORDER
-            ws.cell(row=i, column=6, value=payment.chat_type.upper()).border = cls.BORDER
-            ws.cell(row=i, column=7, value=payment.created_at.strftime("%d.%m.%Y %H:%M")).border = cls.BORDER
-        
-        # Add total row
-        if payments:
-            total_row = len(payments) + 2
-            ws.cell(row=total_row, column=2, value="TOTAL:").font = Font(bold=True)
-            ws.cell(row=total_row, column=3, value=sum(p.amount for p in payments)).font = Font(bold=True)
-            ws.cell(row=total_row, column=3).number_format = '#,##0.00'
-        
-        cls._adjust_column_widths(ws, headers)
-    
-    @classmethod
-    def _write_outgoing_sheet(cls, ws, payments: list[PaymentOut]):
-        """Write outgoing payments to worksheet."""
-        headers = ["#", "Date", "Amount", "Category", "Recipient", "Added"]
-        cls._write_headers(ws, headers)
-        
-        for i, payment in enumerate(payments, start=2):
-            ws.cell(row=i, column=1, value=i - 1).border = cls.BORDER
-            ws.cell(row=i, column=2, value=payment.date.strftime("%d.%m.%Y")).border = cls.BORDER
-            ws.cell(row=i, column=3, value=payment.amount).border = cls.BORDER
-            ws.cell(row=i, column=3).number_format = '#,##0.00'
-            ws.cell(row=i, column=4, value=payment.category).border = cls.BORDER
-            ws.cell(row=i, column=5, value=payment.recipient).border = cls.BORDER
-            ws.cell(row=i, column=6, value=payment.created_at.strftime("%d.%m.%Y %H:%M")).border = cls.BORDER
-        
-        # Add total row
-        if payments:
-            total_row = len(payments) + 2
-            ws.cell(row=total_row, column=2, value="TOTAL:").font = Font(bold=True)
-            ws.cell(row=total_row, column=3, value=sum(p.amount for p in payments)).font = Font(bold=True)
-            ws.cell(row=total_row, column=3).number_format = '#,##0.00'
-        
-        cls._adjust_column_widths(ws, headers)
-    
-    @classmethod
-    def _write_headers(cls, ws, headers: list[str]):
-        """Write styled headers to worksheet."""
-        for col, header in enumerate(headers, start=1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = cls.HEADER_FONT
-            cell.fill = cls.HEADER_FILL
-            cell.border = cls.BORDER
-            cell.alignment = cls.CENTER_ALIGN
-    
-    @classmethod
-    def _adjust_column_widths(cls, ws, headers: list[str]):
-        """Adjust column widths based on content."""
-        min_widths = {
-            "#": 5,
-            "Date": 12,
-            "Amount": 15,
-            "Client": 20,
-            "Teacher": 20,
-            "Chat": 8,
-            "Chat Type": 12,
-            "Category": 20,
-            "Recipient": 20,
-            "Added": 16,
-        }
-        
-        for col, header in enumerate(headers, start=1):
-            width = min_widths.get(header, 15)
-            ws.column_dimensions[get_column_letter(col)].width = width
+import heapq
+import io
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from openpyxl import LXML, Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+from bot.database.crud import PaymentInRow, PaymentOutRow
+from bot.services.money import format_cents, from_cents
+
+try:
+    # Optional faster backend; enabled via ExcelService.XLSXWRITER_BACKEND.
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+logger = logging.getLogger(__name__)
+
+if not LXML:
+    # Write-only mode streams sheets through lxml's xmlfile when it is
+    # installed, roughly 2x faster than the ElementTree fallback. The
+    # fallback still works, so warn instead of failing.
+    logger.warning(
+        "lxml is not installed; Excel reports will use openpyxl's slower "
+        "ElementTree serializer"
+    )
+
+# Report sheets never exceed a handful of columns; precompute the
+# letters instead of redoing base-26 arithmetic in every width loop.
+_COL_LETTERS = tuple(get_column_letter(i) for i in range(1, 27))
+
+
+class ExcelService:
+    """Service for generating Excel reports.
+
+    Workbooks are built in openpyxl's write-only mode: rows stream
+    straight into the xlsx zip instead of being kept as cell objects, so
+    memory stays flat however many payments a period holds. Sheet
+    writers therefore emit rows strictly top-down.
+    """
+
+    # Styles
+    HEADER_FONT = Font(bold=True, color="FFFFFF")
+    BOLD_FONT = Font(bold=True)
+    BOLD_BIG_FONT = Font(bold=True, size=12)
+    TITLE_FONT = Font(bold=True, size=16)
+    HEADER_FILL = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    SUBHEADER_FILL = PatternFill(start_color="8EA9DB", end_color="8EA9DB", fill_type="solid")
+    SUCCESS_FILL = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+    WARNING_FILL = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
+    BORDER = Border(
+        left=Side(style="thin"),
+        right=Side(style="thin"),
+        top=Side(style="thin"),
+        bottom=Side(style="thin"),
+    )
+    CENTER_ALIGN = Alignment(horizontal="center", vertical="center")
+    MONEY_FORMAT = "#,##0.00"
+    DATE_FMT = "%d.%m.%Y"
+    DATETIME_FMT = "%d.%m.%Y %H:%M"
+
+    # Breakdown sheets show at most this many groups; the rest collapse
+    # into a single "Others" row.
+    TOP_N = 50
+
+    # Column widths for the detail sheets, keyed by header.
+    COLUMN_WIDTHS = {
+        "#": 5,
+        "Date": 12,
+        "Amount": 15,
+        "Client": 20,
+        "Teacher": 20,
+        "Chat": 8,
+        "Chat Type": 12,
+        "Category": 20,
+        "Recipient": 20,
+        "Added": 16,
+    }
+
+    # Alternative backend: xlsxwriter in constant_memory mode flushes
+    # each row as it is written, which outperforms openpyxl on the
+    # row-heavy detail sheets. Used for every report when the flag is
+    # set, or automatically once a report exceeds the row threshold.
+    # Requires xlsxwriter; otherwise openpyxl handles everything.
+    XLSXWRITER_BACKEND = False
+    XLSXWRITER_THRESHOLD = 5000
+
+    # xlsxwriter format specs mirroring NAMED_STYLES below; materialized
+    # once per workbook via wb.add_format.
+    XLSXWRITER_FORMATS = {
+        "header": {"bold": True, "font_color": "white", "bg_color": "#4472C4",
+                   "border": 1, "align": "center", "valign": "vcenter"},
+        "bordered": {"border": 1},
+        "money": {"border": 1, "num_format": MONEY_FORMAT},
+        "money_pos": {"border": 1, "bg_color": "#C6EFCE", "num_format": MONEY_FORMAT},
+        "money_neg": {"border": 1, "bg_color": "#FFEB9C", "num_format": MONEY_FORMAT},
+        "bold": {"bold": True},
+        "money_bold": {"bold": True, "num_format": MONEY_FORMAT},
+        "money_plain": {"num_format": MONEY_FORMAT},
+        "title": {"bold": True, "font_size": 16},
+        "subtitle": {"bold": True, "font_size": 12},
+        "section_in": {"bold": True, "bg_color": "#C6EFCE"},
+        "section_out": {"bold": True, "bg_color": "#FFEB9C"},
+        "balance_pos": {"bold": True, "font_size": 12, "bg_color": "#C6EFCE",
+                        "num_format": MONEY_FORMAT},
+        "balance_neg": {"bold": True, "font_size": 12, "bg_color": "#FFEB9C",
+                        "num_format": MONEY_FORMAT},
+    }
+
+    # Named styles are registered once per workbook and referenced by
+    # name, so no per-cell style objects are allocated and the save-time
+    # style dedup pass has almost nothing to do.
+    NAMED_STYLES = (
+        NamedStyle(name="header", font=HEADER_FONT, fill=HEADER_FILL,
+                   border=BORDER, alignment=CENTER_ALIGN),
+        NamedStyle(name="bordered", border=BORDER),
+        NamedStyle(name="money", border=BORDER, number_format=MONEY_FORMAT),
+        NamedStyle(name="money_pos", border=BORDER, fill=SUCCESS_FILL,
+                   number_format=MONEY_FORMAT),
+        NamedStyle(name="money_neg", border=BORDER, fill=WARNING_FILL,
+                   number_format=MONEY_FORMAT),
+        NamedStyle(name="bold", font=BOLD_FONT),
+        NamedStyle(name="money_bold", font=BOLD_FONT, number_format=MONEY_FORMAT),
+        NamedStyle(name="money_plain", number_format=MONEY_FORMAT),
+        NamedStyle(name="title", font=TITLE_FONT),
+        NamedStyle(name="subtitle", font=BOLD_BIG_FONT),
+        NamedStyle(name="section_in", font=BOLD_FONT, fill=SUCCESS_FILL),
+        NamedStyle(name="section_out", font=BOLD_FONT, fill=WARNING_FILL),
+        NamedStyle(name="balance_pos", font=BOLD_BIG_FONT,
+                   fill=SUCCESS_FILL, number_format=MONEY_FORMAT),
+        NamedStyle(name="balance_neg", font=BOLD_BIG_FONT,
+                   fill=WARNING_FILL, number_format=MONEY_FORMAT),
+    )
+
+    @classmethod
+    def _build_workbook(
+        cls,
+        incoming: list[PaymentInRow],
+        outgoing: list[PaymentOutRow],
+        period_name: str = "Report",
+    ) -> Workbook:
+        """Build the comprehensive report workbook for a given period."""
+        wb = Workbook(write_only=True)
+        for style in cls.NAMED_STYLES:
+            wb.add_named_style(style)
+
+        # The summary metrics feed several sheets; compute them once and
+        # thread them through instead of re-walking the payment lists.
+        stats = cls._summary_stats(incoming, outgoing)
+
+        # Create sheets (write-only mode has no default sheet)
+        ws_summary = wb.create_sheet("Summary")
+        cls._write_comprehensive_summary(
+            ws_summary, incoming, outgoing, period_name, stats
+        )
+
+        ws_daily = wb.create_sheet("By Day")
+        cls._write_daily_breakdown(ws_daily, incoming, outgoing)
+
+        ws_in = wb.create_sheet("Incoming Payments")
+        cls._write_incoming_sheet(ws_in, incoming)
+
+        ws_out = wb.create_sheet("Outgoing Payments")
+        cls._write_outgoing_sheet(ws_out, outgoing)
+
+        ws_teachers = wb.create_sheet("By Teacher")
+        cls._write_teachers_breakdown(ws_teachers, incoming, stats["total_in"])
+
+        ws_categories = wb.create_sheet("By Category")
+        cls._write_categories_breakdown(ws_categories, outgoing, stats["total_out"])
+
+        return wb
+
+    @classmethod
+    def _use_xlsxwriter(
+        cls,
+        incoming: list[PaymentInRow],
+        outgoing: list[PaymentOutRow],
+    ) -> bool:
+        """Decide whether this report should use the xlsxwriter backend."""
+        if xlsxwriter is None:
+            return False
+        if cls.XLSXWRITER_BACKEND:
+            return True
+        return len(incoming) + len(outgoing) > cls.XLSXWRITER_THRESHOLD
+
+    @classmethod
+    def generate_period_report(
+        cls,
+        incoming: list[PaymentInRow],
+        outgoing: list[PaymentOutRow],
+        period_name: str = "Report",
+    ) -> io.BytesIO:
+        """Generate comprehensive Excel report for a given period."""
+        if cls._use_xlsxwriter(incoming, outgoing):
+            output = io.BytesIO()
+            cls._generate_with_xlsxwriter(incoming, outgoing, period_name, output)
+            output.seek(0)
+            return output
+
+        wb = cls._build_workbook(incoming, outgoing, period_name)
+
+        # Save to bytes
+        output = io.BytesIO()
+        wb.save(output)
+        output.seek(0)
+
+        return output
+
+    @classmethod
+    def save_period_report(
+        cls,
+        incoming: list[PaymentInRow],
+        outgoing: list[PaymentOutRow],
+        path: str,
+        period_name: str = "Report",
+    ) -> None:
+        """Write the report straight to a file, skipping the in-memory copy."""
+        if cls._use_xlsxwriter(incoming, outgoing):
+            cls._generate_with_xlsxwriter(incoming, outgoing, period_name, path)
+            return
+
+        wb = cls._build_workbook(incoming, outgoing, period_name)
+        wb.save(path)
+
+    # Keep old method name for backward compatibility
+    @classmethod
+    def generate_7_days_report(
+        cls,
+        incoming: list[PaymentInRow],
+        outgoing: list[PaymentOutRow],
+    ) -> io.BytesIO:
+        """Generate comprehensive Excel report for the last 7 days."""
+        return cls.generate_period_report(incoming, outgoing, period_name="Last 7 Days")
+
+    @classmethod
+    def _cell(cls, ws, value, style=None):
+        """Build a write-only cell carrying a registered named style."""
+        cell = WriteOnlyCell(ws, value=value)
+        if style is not None:
+            cell.style = style
+        return cell
+
+    @classmethod
+    def _money_cell(cls, ws, cents, style="money_plain"):
+        """Build a write-only cell holding a money amount."""
+        return cls._cell(ws, from_cents(cents), style)
+
+    @staticmethod
+    def _summary_stats(
+        incoming: list[PaymentInRow],
+        outgoing: list[PaymentOutRow],
+    ) -> dict:
+        """Gather every summary metric in one pass per payment list."""
+        total_in = 0
+        max_in = min_in = None
+        ru_count = ru_sum = 0
+        eng_count = eng_sum = 0
+        for p in incoming:
+            amount = p.amount
+            total_in += amount
+            if max_in is None or amount > max_in:
+                max_in = amount
+            if min_in is None or amount < min_in:
+                min_in = amount
+            if p.chat_type == "ru":
+                ru_count += 1
+                ru_sum += amount
+            elif p.chat_type == "eng":
+                eng_count += 1
+                eng_sum += amount
+
+        total_out = 0
+        max_out = min_out = None
+        for p in outgoing:
+            amount = p.amount
+            total_out += amount
+            if max_out is None or amount > max_out:
+                max_out = amount
+            if min_out is None or amount < min_out:
+                min_out = amount
+
+        return {
+            "total_in": total_in, "max_in": max_in, "min_in": min_in,
+            "ru_count": ru_count, "ru_sum": ru_sum,
+            "eng_count": eng_count, "eng_sum": eng_sum,
+            "total_out": total_out, "max_out": max_out, "min_out": min_out,
+        }
+
+    @classmethod
+    def _group_stats(
+        cls, payments, key: str, total_amount: int | None = None
+    ) -> tuple[list, int, tuple | None]:
+        """Aggregate [total, count, first date, last date] per grouping key.
+
+        Returns the top TOP_N groups by amount descending, the overall
+        total, and an ``(amount, count)`` remainder when more groups
+        exist than fit the sheet — all from a single pass over the
+        payments. nlargest keeps only TOP_N candidates in memory instead
+        of sorting the full group list.
+        """
+        stats: dict[str, list] = {}
+        track_total = total_amount is None
+        if track_total:
+            total_amount = 0
+        for p in payments:
+            if track_total:
+                total_amount += p.amount
+            entry = stats.get(getattr(p, key))
+            if entry is None:
+                stats[getattr(p, key)] = [p.amount, 1, p.date, p.date]
+            else:
+                entry[0] += p.amount
+                entry[1] += 1
+                if p.date < entry[2]:
+                    entry[2] = p.date
+                elif p.date > entry[3]:
+                    entry[3] = p.date
+
+        ordered = heapq.nlargest(cls.TOP_N, stats.items(), key=lambda kv: kv[1][0])
+        others = None
+        if len(stats) > cls.TOP_N:
+            shown_amount = sum(entry[0] for _, entry in ordered)
+            shown_count = sum(entry[1] for _, entry in ordered)
+            others = (total_amount - shown_amount, len(payments) - shown_count)
+        return ordered, total_amount, others
+
+    @staticmethod
+    def _daily_stats(
+        incoming: list[PaymentInRow],
+        outgoing: list[PaymentOutRow],
+    ) -> tuple[dict, dict, dict, dict]:
+        """Aggregate per-date counts and sums straight into scalars.
+
+        The daily rows only need counts and sums, so there is no point
+        holding grouped payment lists.
+        """
+        in_sum: dict = defaultdict(int)
+        in_cnt: dict = defaultdict(int)
+        out_sum: dict = defaultdict(int)
+        out_cnt: dict = defaultdict(int)
+
+        for p in incoming:
+            in_sum[p.date] += p.amount
+            in_cnt[p.date] += 1
+        for p in outgoing:
+            out_sum[p.date] += p.amount
+            out_cnt[p.date] += 1
+
+        return in_sum, in_cnt, out_sum, out_cnt
+
+    @classmethod
+    def _write_comprehensive_summary(
+        cls,
+        ws,
+        incoming: list[PaymentInRow],
+        outgoing: list[PaymentOutRow],
+        period_name: str = "Report",
+        stats: dict | None = None,
+    ):
+        """Write comprehensive summary sheet."""
+        ws.column_dimensions["A"].width = 25
+        ws.column_dimensions["B"].width = 30
+
+        if stats is None:
+            stats = cls._summary_stats(incoming, outgoing)
+        total_in = stats["total_in"]
+        total_out = stats["total_out"]
+        max_in, min_in = stats["max_in"], stats["min_in"]
+        max_out, min_out = stats["max_out"], stats["min_out"]
+        ru_count, ru_sum = stats["ru_count"], stats["ru_sum"]
+        eng_count, eng_sum = stats["eng_count"], stats["eng_sum"]
+        balance = total_in - total_out
+
+        # Title
+        ws.append([cls._cell(ws, f"FINANCIAL REPORT: {period_name.upper()}", "title")])
+
+        # Period info
+        if incoming or outgoing:
+            all_dates = [p.date for p in incoming] + [p.date for p in outgoing]
+            start_date = min(all_dates) if all_dates else date.today()
+            end_date = max(all_dates) if all_dates else date.today()
+            ws.append([f"Period: {start_date.strftime(cls.DATE_FMT)} - {end_date.strftime(cls.DATE_FMT)}"])
+        else:
+            ws.append(["Period: No data"])
+
+        ws.append([f"Generated: {date.today().strftime(cls.DATE_FMT)}"])
+        ws.append([])
+
+        # Main metrics
+        ws.append([cls._cell(ws, "KEY METRICS", "subtitle")])
+
+        # Incoming section
+        ws.append([cls._cell(ws, "INCOMING PAYMENTS (DEBIT)", "section_in")])
+        ws.append(["Total Amount:", cls._money_cell(ws, total_in)])
+        ws.append(["Transaction Count:", len(incoming)])
+
+        if incoming:
+            avg_in = total_in / len(incoming)
+            ws.append(["Average Payment:", cls._money_cell(ws, avg_in)])
+            ws.append(["Max Payment:", cls._money_cell(ws, max_in)])
+            ws.append(["Min Payment:", cls._money_cell(ws, min_in)])
+
+            # By chat type
+            ws.append([
+                "From RU chat:",
+                f"{ru_count} pcs. for {format_cents(ru_sum)}",
+            ])
+            ws.append([
+                "From ENG chat:",
+                f"{eng_count} pcs. for {format_cents(eng_sum)}",
+            ])
+
+        ws.append([])
+
+        # Outgoing section
+        ws.append([cls._cell(ws, "OUTGOING PAYMENTS (CREDIT)", "section_out")])
+        ws.append(["Total Amount:", cls._money_cell(ws, total_out)])
+        ws.append(["Transaction Count:", len(outgoing)])
+
+        if outgoing:
+            avg_out = total_out / len(outgoing)
+            ws.append(["Average Payment:", cls._money_cell(ws, avg_out)])
+            ws.append(["Max Payment:", cls._money_cell(ws, max_out)])
+            ws.append(["Min Payment:", cls._money_cell(ws, min_out)])
+
+        ws.append([])
+
+        # Balance
+        balance_style = "balance_pos" if balance >= 0 else "balance_neg"
+        ws.append([
+            cls._cell(ws, "TOTAL BALANCE", "subtitle"),
+            cls._money_cell(ws, balance, balance_style),
+        ])
+
+    @classmethod
+    def _write_daily_breakdown(
+        cls,
+        ws,
+        incoming: list[PaymentInRow],
+        outgoing: list[PaymentOutRow],
+    ):
+        """Write daily breakdown sheet."""
+        headers = ["Date", "Incoming (count)", "Incoming (amount)",
+                   "Outgoing (count)", "Outgoing (amount)", "Day Balance"]
+        widths = [12, 18, 18, 18, 18, 15]
+        for col, width in enumerate(widths):
+            ws.column_dimensions[_COL_LETTERS[col]].width = width
+        cls._write_headers(ws, headers)
+
+        in_sum, in_cnt, out_sum, out_cnt = cls._daily_stats(incoming, outgoing)
+
+        # Get all dates in range
+        all_dates = set(in_sum) | set(out_sum)
+        if not all_dates:
+            # Show last 7 days even if empty
+            today = date.today()
+            all_dates = {today - timedelta(days=i) for i in range(7)}
+
+        total_in = 0
+        total_out = 0
+
+        for d in sorted(all_dates, reverse=True):
+            sum_in = in_sum.get(d, 0)
+            sum_out = out_sum.get(d, 0)
+            day_balance = sum_in - sum_out
+
+            total_in += sum_in
+            total_out += sum_out
+
+            balance_style = "money_pos" if day_balance >= 0 else "money_neg"
+            ws.append([
+                cls._cell(ws, d.strftime(cls.DATE_FMT), "bordered"),
+                cls._cell(ws, in_cnt.get(d, 0), "bordered"),
+                cls._money_cell(ws, sum_in, "money"),
+                cls._cell(ws, out_cnt.get(d, 0), "bordered"),
+                cls._money_cell(ws, sum_out, "money"),
+                cls._money_cell(ws, day_balance, balance_style),
+            ])
+
+        # Total row
+        ws.append([])
+        ws.append([
+            cls._cell(ws, "TOTAL", "bold"),
+            cls._cell(ws, len(incoming), "bold"),
+            cls._money_cell(ws, total_in, "money_bold"),
+            cls._cell(ws, len(outgoing), "bold"),
+            cls._money_cell(ws, total_out, "money_bold"),
+            cls._money_cell(ws, total_in - total_out, "money_bold"),
+        ])
+
+    @classmethod
+    def _write_teachers_breakdown(
+        cls, ws, incoming: list[PaymentInRow], total_in: int | None = None
+    ):
+        """Write breakdown by teacher."""
+        headers = ["Teacher", "Count", "Amount", "Average", "% of Total", "First Date", "Last Date"]
+        widths = [25, 12, 15, 15, 12, 14, 14]
+        for col, width in enumerate(widths):
+            ws.column_dimensions[_COL_LETTERS[col]].width = width
+        cls._write_headers(ws, headers)
+
+        if not incoming:
+            ws.append(["No data"])
+            return
+
+        sorted_teachers, total_amount, others = cls._group_stats(
+            incoming, "teacher", total_in
+        )
+
+        for teacher, (total, count, first_date, last_date) in sorted_teachers:
+            avg = total / count
+            pct = (total / total_amount * 100) if total_amount > 0 else 0
+
+            ws.append([
+                cls._cell(ws, teacher, "bordered"),
+                cls._cell(ws, count, "bordered"),
+                cls._money_cell(ws, total, "money"),
+                cls._money_cell(ws, avg, "money"),
+                cls._cell(ws, f"{pct:.1f}%", "bordered"),
+                cls._cell(ws, first_date.strftime(cls.DATE_FMT), "bordered"),
+                cls._cell(ws, last_date.strftime(cls.DATE_FMT), "bordered"),
+            ])
+
+        cls._write_others_row(ws, others, total_amount)
+
+        # Total
+        ws.append([])
+        ws.append([
+            cls._cell(ws, "TOTAL", "bold"),
+            cls._cell(ws, len(incoming), "bold"),
+            cls._money_cell(ws, total_amount, "money_bold"),
+        ])
+
+    @classmethod
+    def _write_categories_breakdown(
+        cls, ws, outgoing: list[PaymentOutRow], total_out: int | None = None
+    ):
+        """Write breakdown by category."""
+        headers = ["Category", "Count", "Amount", "Average", "% of Total", "First Date", "Last Date"]
+        widths = [25, 12, 15, 15, 12, 14, 14]
+        for col, width in enumerate(widths):
+            ws.column_dimensions[_COL_LETTERS[col]].width = width
+        cls._write_headers(ws, headers)
+
+        if not outgoing:
+            ws.append(["No data"])
+            return
+
+        sorted_categories, total_amount, others = cls._group_stats(
+            outgoing, "category", total_out
+        )
+
+        for category, (total, count, first_date, last_date) in sorted_categories:
+            avg = total / count
+            pct = (total / total_amount * 100) if total_amount > 0 else 0
+
+            ws.append([
+                cls._cell(ws, category, "bordered"),
+                cls._cell(ws, count, "bordered"),
+                cls._money_cell(ws, total, "money"),
+                cls._money_cell(ws, avg, "money"),
+                cls._cell(ws, f"{pct:.1f}%", "bordered"),
+                cls._cell(ws, first_date.strftime(cls.DATE_FMT), "bordered"),
+                cls._cell(ws, last_date.strftime(cls.DATE_FMT), "bordered"),
+            ])
+
+        cls._write_others_row(ws, others, total_amount)
+
+        # Total
+        ws.append([])
+        ws.append([
+            cls._cell(ws, "TOTAL", "bold"),
+            cls._cell(ws, len(outgoing), "bold"),
+            cls._money_cell(ws, total_amount, "money_bold"),
+        ])
+
+    @classmethod
+    def _write_others_row(cls, ws, others: tuple | None, total_amount: int):
+        """Append the collapsed row for groups beyond TOP_N, if any."""
+        if not others:
+            return
+        amount, count = others
+        pct = (amount / total_amount * 100) if total_amount > 0 else 0
+        ws.append([
+            cls._cell(ws, "Others", "bordered"),
+            cls._cell(ws, count, "bordered"),
+            cls._money_cell(ws, amount, "money"),
+            cls._money_cell(ws, amount / count if count else 0, "money"),
+            cls._cell(ws, f"{pct:.1f}%", "bordered"),
+            cls._cell(ws, "", "bordered"),
+            cls._cell(ws, "", "bordered"),
+        ])
+
+    @classmethod
+    def _write_incoming_sheet(cls, ws, payments: list[PaymentInRow]):
+        """Write incoming payments to worksheet."""
+        headers = ["#", "Date", "Amount", "Client", "Teacher", "Chat", "Added"]
+        cls._set_column_widths(ws, headers)
+        cls._write_headers(ws, headers)
+
+        # strftime is costly per call; reports hold few unique dates, so
+        # format each one once and reuse the string. Bind the helpers to
+        # locals — the loop body runs seven lookups per row otherwise.
+        cell = cls._cell
+        money_cell = cls._money_cell
+        append = ws.append
+        datetime_fmt = cls.DATETIME_FMT
+        date_strs: dict[date, str] = {}
+        created_strs: dict[datetime, str] = {}
+        total = 0
+        for i, payment in enumerate(payments, start=1):
+            total += payment.amount
+            date_str = date_strs.get(payment.date)
+            if date_str is None:
+                date_str = date_strs[payment.date] = payment.date.strftime(cls.DATE_FMT)
+            # The Added column only shows minute precision, so truncate
+            # before the cache lookup; bulk-inserted rows share minutes.
+            created = payment.created_at.replace(second=0, microsecond=0)
+            created_str = created_strs.get(created)
+            if created_str is None:
+                created_str = created_strs[created] = created.strftime(datetime_fmt)
+            append([
+                cell(ws, i, "bordered"),
+                cell(ws, date_str, "bordered"),
+                money_cell(ws, payment.amount, "money"),
+                cell(ws, payment.client, "bordered"),
+                cell(ws, payment.teacher, "bordered"),
+                cell(ws, payment.chat_type.upper(), "bordered"),
+                cell(ws, created_str, "bordered"),
+            ])
+
+        # Add total row
+        if payments:
+            ws.append([
+                None,
+                cls._cell(ws, "TOTAL:", "bold"),
+                cls._money_cell(ws, total, "money_bold"),
+            ])
+
+    @classmethod
+    def _write_outgoing_sheet(cls, ws, payments: list[PaymentOutRow]):
+        """Write outgoing payments to worksheet."""
+        headers = ["#", "Date", "Amount", "Category", "Recipient", "Added"]
+        cls._set_column_widths(ws, headers)
+        cls._write_headers(ws, headers)
+
+        cell = cls._cell
+        money_cell = cls._money_cell
+        append = ws.append
+        datetime_fmt = cls.DATETIME_FMT
+        date_strs: dict[date, str] = {}
+        created_strs: dict[datetime, str] = {}
+        total = 0
+        for i, payment in enumerate(payments, start=1):
+            total += payment.amount
+            date_str = date_strs.get(payment.date)
+            if date_str is None:
+                date_str = date_strs[payment.date] = payment.date.strftime(cls.DATE_FMT)
+            created = payment.created_at.replace(second=0, microsecond=0)
+            created_str = created_strs.get(created)
+            if created_str is None:
+                created_str = created_strs[created] = created.strftime(datetime_fmt)
+            append([
+                cell(ws, i, "bordered"),
+                cell(ws, date_str, "bordered"),
+                money_cell(ws, payment.amount, "money"),
+                cell(ws, payment.category, "bordered"),
+                cell(ws, payment.recipient, "bordered"),
+                cell(ws, created_str, "bordered"),
+            ])
+
+        # Add total row
+        if payments:
+            ws.append([
+                None,
+                cls._cell(ws, "TOTAL:", "bold"),
+                cls._money_cell(ws, total, "money_bold"),
+            ])
+
+    @classmethod
+    def _write_headers(cls, ws, headers: list[str]):
+        """Write styled headers to worksheet."""
+        ws.append([cls._cell(ws, header, "header") for header in headers])
+
+    @classmethod
+    def _set_column_widths(cls, ws, headers: list[str]):
+        """Set column widths based on headers (before any row is appended)."""
+        for col, header in enumerate(headers):
+            width = cls.COLUMN_WIDTHS.get(header, 15)
+            ws.column_dimensions[_COL_LETTERS[col]].width = width
+
+    @classmethod
+    def _generate_with_xlsxwriter(
+        cls,
+        incoming: list[PaymentInRow],
+        outgoing: list[PaymentOutRow],
+        period_name: str,
+        target,
+    ) -> None:
+        """Write the report with xlsxwriter in constant_memory mode.
+
+        Each row is flushed as soon as it is written, so memory stays
+        bounded; formats are materialized once per workbook up front.
+        ``target`` may be a path or a writable binary buffer.
+        """
+        wb = xlsxwriter.Workbook(
+            target, {"constant_memory": True, "strings_to_numbers": False}
+        )
+        try:
+            fmts = {
+                name: wb.add_format(spec)
+                for name, spec in cls.XLSXWRITER_FORMATS.items()
+            }
+            stats = cls._summary_stats(incoming, outgoing)
+            cls._xw_summary(wb.add_worksheet("Summary"), incoming, outgoing,
+                            period_name, fmts, stats)
+            cls._xw_daily(wb.add_worksheet("By Day"), incoming, outgoing, fmts)
+            cls._xw_incoming(wb.add_worksheet("Incoming Payments"), incoming, fmts)
+            cls._xw_outgoing(wb.add_worksheet("Outgoing Payments"), outgoing, fmts)
+            cls._xw_breakdown(wb.add_worksheet("By Teacher"), incoming,
+                              "teacher", "Teacher", fmts, stats["total_in"])
+            cls._xw_breakdown(wb.add_worksheet("By Category"), outgoing,
+                              "category", "Category", fmts, stats["total_out"])
+        finally:
+            wb.close()
+
+    @classmethod
+    def _xw_headers(cls, ws, headers: list[str], fmts) -> None:
+        """Write styled headers and column widths to an xlsxwriter sheet."""
+        for col, header in enumerate(headers):
+            ws.set_column(col, col, cls.COLUMN_WIDTHS.get(header, 15))
+        ws.write_row(0, 0, headers, fmts["header"])
+
+    @classmethod
+    def _xw_summary(cls, ws, incoming, outgoing, period_name, fmts, stats) -> None:
+        """Write the summary sheet via xlsxwriter."""
+        ws.set_column(0, 0, 25)
+        ws.set_column(1, 1, 30)
+        total_in = stats["total_in"]
+        total_out = stats["total_out"]
+        balance = total_in - total_out
+
+        row = 0
+        ws.write(row, 0, f"FINANCIAL REPORT: {period_name.upper()}", fmts["title"])
+        row += 1
+
+        if incoming or outgoing:
+            all_dates = [p.date for p in incoming] + [p.date for p in outgoing]
+            start_date = min(all_dates)
+            end_date = max(all_dates)
+            ws.write(row, 0, f"Period: {start_date.strftime(cls.DATE_FMT)}"
+                             f" - {end_date.strftime(cls.DATE_FMT)}")
+        else:
+            ws.write(row, 0, "Period: No data")
+        row += 1
+
+        ws.write(row, 0, f"Generated: {date.today().strftime(cls.DATE_FMT)}")
+        row += 2
+
+        ws.write(row, 0, "KEY METRICS", fmts["subtitle"])
+        row += 1
+
+        ws.write(row, 0, "INCOMING PAYMENTS (DEBIT)", fmts["section_in"])
+        row += 1
+        ws.write(row, 0, "Total Amount:")
+        ws.write(row, 1, from_cents(total_in), fmts["money_plain"])
+        row += 1
+        ws.write(row, 0, "Transaction Count:")
+        ws.write(row, 1, len(incoming))
+        row += 1
+
+        if incoming:
+            for label, cents in (
+                ("Average Payment:", total_in / len(incoming)),
+                ("Max Payment:", stats["max_in"]),
+                ("Min Payment:", stats["min_in"]),
+            ):
+                ws.write(row, 0, label)
+                ws.write(row, 1, from_cents(cents), fmts["money_plain"])
+                row += 1
+
+            ws.write(row, 0, "From RU chat:")
+            ws.write(row, 1, f"{stats['ru_count']} pcs. for "
+                             f"{format_cents(stats['ru_sum'])}")
+            row += 1
+            ws.write(row, 0, "From ENG chat:")
+            ws.write(row, 1, f"{stats['eng_count']} pcs. for "
+                             f"{format_cents(stats['eng_sum'])}")
+            row += 1
+
+        row += 1
+        ws.write(row, 0, "OUTGOING PAYMENTS (CREDIT)", fmts["section_out"])
+        row += 1
+        ws.write(row, 0, "Total Amount:")
+        ws.write(row, 1, from_cents(total_out), fmts["money_plain"])
+        row += 1
+        ws.write(row, 0, "Transaction Count:")
+        ws.write(row, 1, len(outgoing))
+        row += 1
+
+        if outgoing:
+            for label, cents in (
+                ("Average Payment:", total_out / len(outgoing)),
+                ("Max Payment:", stats["max_out"]),
+                ("Min Payment:", stats["min_out"]),
+            ):
+                ws.write(row, 0, label)
+                ws.write(row, 1, from_cents(cents), fmts["money_plain"])
+                row += 1
+
+        row += 1
+        balance_fmt = fmts["balance_pos"] if balance >= 0 else fmts["balance_neg"]
+        ws.write(row, 0, "TOTAL BALANCE", fmts["subtitle"])
+        ws.write(row, 1, from_cents(balance), balance_fmt)
+
+    @classmethod
+    def _xw_daily(cls, ws, incoming, outgoing, fmts) -> None:
+        """Write the daily breakdown sheet via xlsxwriter."""
+        headers = ["Date", "Incoming (count)", "Incoming (amount)",
+                   "Outgoing (count)", "Outgoing (amount)", "Day Balance"]
+        for col, width in enumerate([12, 18, 18, 18, 18, 15]):
+            ws.set_column(col, col, width)
+        ws.write_row(0, 0, headers, fmts["header"])
+
+        in_sum, in_cnt, out_sum, out_cnt = cls._daily_stats(incoming, outgoing)
+
+        all_dates = set(in_sum) | set(out_sum)
+        if not all_dates:
+            today = date.today()
+            all_dates = {today - timedelta(days=i) for i in range(7)}
+
+        total_in = 0
+        total_out = 0
+        row = 1
+        for d in sorted(all_dates, reverse=True):
+            sum_in = in_sum.get(d, 0)
+            sum_out = out_sum.get(d, 0)
+            day_balance = sum_in - sum_out
+            total_in += sum_in
+            total_out += sum_out
+
+            balance_fmt = fmts["money_pos"] if day_balance >= 0 else fmts["money_neg"]
+            ws.write(row, 0, d.strftime(cls.DATE_FMT), fmts["bordered"])
+            ws.write(row, 1, in_cnt.get(d, 0), fmts["bordered"])
+            ws.write(row, 2, from_cents(sum_in), fmts["money"])
+            ws.write(row, 3, out_cnt.get(d, 0), fmts["bordered"])
+            ws.write(row, 4, from_cents(sum_out), fmts["money"])
+            ws.write(row, 5, from_cents(day_balance), balance_fmt)
+            row += 1
+
+        row += 1
+        ws.write(row, 0, "TOTAL", fmts["bold"])
+        ws.write(row, 1, len(incoming), fmts["bold"])
+        ws.write(row, 2, from_cents(total_in), fmts["money_bold"])
+        ws.write(row, 3, len(outgoing), fmts["bold"])
+        ws.write(row, 4, from_cents(total_out), fmts["money_bold"])
+        ws.write(row, 5, from_cents(total_in - total_out), fmts["money_bold"])
+
+    @classmethod
+    def _xw_incoming(cls, ws, payments: list[PaymentInRow], fmts) -> None:
+        """Write incoming payments via xlsxwriter."""
+        cls._xw_headers(ws, ["#", "Date", "Amount", "Client", "Teacher",
+                             "Chat", "Added"], fmts)
+
+        bordered = fmts["bordered"]
+        money = fmts["money"]
+        date_strs: dict[date, str] = {}
+        created_strs: dict[datetime, str] = {}
+        total = 0
+        row = 0
+        for row, payment in enumerate(payments, start=1):
+            total += payment.amount
+            date_str = date_strs.get(payment.date)
+            if date_str is None:
+                date_str = date_strs[payment.date] = payment.date.strftime(cls.DATE_FMT)
+            created = payment.created_at.replace(second=0, microsecond=0)
+            created_str = created_strs.get(created)
+            if created_str is None:
+                created_str = created_strs[created] = created.strftime(cls.DATETIME_FMT)
+            ws.write(row, 0, row, bordered)
+            ws.write(row, 1, date_str, bordered)
+            ws.write(row, 2, from_cents(payment.amount), money)
+            ws.write(row, 3, payment.client, bordered)
+            ws.write(row, 4, payment.teacher, bordered)
+            ws.write(row, 5, payment.chat_type.upper(), bordered)
+            ws.write(row, 6, created_str, bordered)
+
+        if payments:
+            ws.write(row + 1, 1, "TOTAL:", fmts["bold"])
+            ws.write(row + 1, 2, from_cents(total), fmts["money_bold"])
+
+    @classmethod
+    def _xw_outgoing(cls, ws, payments: list[PaymentOutRow], fmts) -> None:
+        """Write outgoing payments via xlsxwriter."""
+        cls._xw_headers(ws, ["#", "Date", "Amount", "Category", "Recipient",
+                             "Added"], fmts)
+
+        bordered = fmts["bordered"]
+        money = fmts["money"]
+        date_strs: dict[date, str] = {}
+        created_strs: dict[datetime, str] = {}
+        total = 0
+        row = 0
+        for row, payment in enumerate(payments, start=1):
+            total += payment.amount
+            date_str = date_strs.get(payment.date)
+            if date_str is None:
+                date_str = date_strs[payment.date] = payment.date.strftime(cls.DATE_FMT)
+            created = payment.created_at.replace(second=0, microsecond=0)
+            created_str = created_strs.get(created)
+            if created_str is None:
+                created_str = created_strs[created] = created.strftime(cls.DATETIME_FMT)
+            ws.write(row, 0, row, bordered)
+            ws.write(row, 1, date_str, bordered)
+            ws.write(row, 2, from_cents(payment.amount), money)
+            ws.write(row, 3, payment.category, bordered)
+            ws.write(row, 4, payment.recipient, bordered)
+            ws.write(row, 5, created_str, bordered)
+
+        if payments:
+            ws.write(row + 1, 1, "TOTAL:", fmts["bold"])
+            ws.write(row + 1, 2, from_cents(total), fmts["money_bold"])
+
+    @classmethod
+    def _xw_breakdown(
+        cls, ws, payments, key: str, label: str, fmts, total_amount=None
+    ) -> None:
+        """Write a teacher/category breakdown sheet via xlsxwriter."""
+        headers = [label, "Count", "Amount", "Average", "% of Total",
+                   "First Date", "Last Date"]
+        for col, width in enumerate([25, 12, 15, 15, 12, 14, 14]):
+            ws.set_column(col, col, width)
+        ws.write_row(0, 0, headers, fmts["header"])
+
+        if not payments:
+            ws.write(1, 0, "No data")
+            return
+
+        groups, total_amount, others = cls._group_stats(payments, key, total_amount)
+
+        bordered = fmts["bordered"]
+        money = fmts["money"]
+        row = 0
+        for row, (name, (total, count, first_date, last_date)) in enumerate(
+            groups, start=1
+        ):
+            pct = (total / total_amount * 100) if total_amount > 0 else 0
+            ws.write(row, 0, name, bordered)
+            ws.write(row, 1, count, bordered)
+            ws.write(row, 2, from_cents(total), money)
+            ws.write(row, 3, from_cents(total / count), money)
+            ws.write(row, 4, f"{pct:.1f}%", bordered)
+            ws.write(row, 5, first_date.strftime(cls.DATE_FMT), bordered)
+            ws.write(row, 6, last_date.strftime(cls.DATE_FMT), bordered)
+
+        if others:
+            amount, count = others
+            pct = (amount / total_amount * 100) if total_amount > 0 else 0
+            row += 1
+            ws.write(row, 0, "Others", bordered)
+            ws.write(row, 1, count, bordered)
+            ws.write(row, 2, from_cents(amount), money)
+            ws.write(row, 3, from_cents(amount / count if count else 0), money)
+            ws.write(row, 4, f"{pct:.1f}%", bordered)
+
+        ws.write(row + 2, 0, "TOTAL", fmts["bold"])
+        ws.write(row + 2, 1, len(payments), fmts["bold"])
+        ws.write(row + 2, 2, from_cents(total_amount), fmts["money_bold"])
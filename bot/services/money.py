@@ -0,0 +1,22 @@
+"""Helpers for amounts stored as integer cents.
+
+Amounts live in the database as scaled integers so sums stay exact and
+formatting avoids float rounding.
+"""
+
+
+def to_cents(value: float) -> int:
+    """Convert a parsed amount to integer cents."""
+    return round(value * 100)
+
+
+def from_cents(cents: int) -> float:
+    """Cents as a plain numeric amount, e.g. for Excel cells."""
+    return cents / 100
+
+
+def format_cents(cents: int) -> str:
+    """Format integer cents as a human-readable amount, e.g. 1,234.56."""
+    sign = "-" if cents < 0 else ""
+    whole, frac = divmod(abs(cents), 100)
+    return f"{sign}{whole:,}.{frac:02d}"
@@ -1,102 +1,123 @@
-from dataclasses import dataclass
-
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from bot.database.crud import PaymentInCRUD, PaymentOutCRUD
-from bot.database.models import PaymentIn, PaymentOut
-
-
-@dataclass
-class DebitCreditReport:
-    """Report with debit/credit information."""
-    
-    total_incoming: float
-    total_outgoing: float
-    incoming_count: int
-    outgoing_count: int
-    
-    @property
-    def balance(self) -> float:
-        return self.total_incoming - self.total_outgoing
-
-
-@dataclass
-class BalanceReport:
-    """Current balance report."""
-    
-    total_incoming: float
-    total_outgoing: float
-    
-    @property
-    def balance(self) -> float:
-        return self.total_incoming - self.total_outgoing
-
-
-class ReportsService:
-    """Service for generating reports."""
-    
-    @staticmethod
-    async def get_debit_credit(session: AsyncSession) -> DebitCreditReport:
-        """Get debit/credit report for the current month."""
-        total_incoming = await PaymentInCRUD.get_total_amount_current_month(session)
-        total_outgoing = await PaymentOutCRUD.get_total_amount_current_month(session)
-        incoming_count = await PaymentInCRUD.get_count_current_month(session)
-        outgoing_count = await PaymentOutCRUD.get_count_current_month(session)
-        
-        return DebitCreditReport(
-            total_incoming=total_incoming,
-            total_outgoing=total_outgoing,
-            incoming_count=incoming_count,
-            outgoing_count=outgoing_count,
-        )
-    
-    @staticmethod
-    async def get_balance(session: AsyncSession) -> BalanceReport:
-        """Get current balance for current month."""
-        total_incoming = await PaymentInCRUD.get_total_amount_current_month(session)
-        total_outgoing = await PaymentOutCRUD.get_total_amount_current_month(session)
-        
-        return BalanceReport(
-            total_incoming=total_incoming,
-            total_outgoing=total_outgoing,
-        )
-    
-    @staticmethod
-    async def get_last_incoming(session: AsyncSession) -> PaymentIn | None:
-        """Get the last incoming payment."""
-        return await PaymentInCRUD.get_last(session)
-    
-    @staticmethod
-    async def get_last_outgoing(session: AsyncSession) -> PaymentOut | None:
-        """Get the last outgoing payment."""
-        return await PaymentOutCRUD.get_last(session)
-    
-    @staticmethod
-    async def get_last_7_days_incoming(session: AsyncSession) -> list[PaymentIn]:
-        """Get incoming payments for the last 7 days."""
-        return await PaymentInCRUD.get_last_7_days(session)
-    
-    @staticmethod
-    async def get_last_7_days_outgoing(session: AsyncSession) -> list[PaymentOut]:
-        """Get outgoing payments for the last 7 days."""
-        return await PaymentOutCRUD.get_last_7_days(session)
-    
-    @staticmethod
-    async def get_current_month_incoming(session: AsyncSession) -> list[PaymentIn]:
-        """Get incoming payments for the current month."""
-        return await PaymentInCRUD.get_current_month(session)
-    
-    @staticmethod
-    async def get_current_month_outgoing(session: AsyncSession) -> list[PaymentOut]:
-        """Get outgoing payments for the current month."""
-        return await PaymentOutCRUD.get_current_month(session)
-    
-    @staticmethod
-    async def get_previous_month_incoming(session: AsyncSession) -> list[PaymentIn]:
-        """Get incoming payments for the previous month."""
-        return await PaymentInCRUD.get_previous_month(session)
-    
-    @staticmethod
-    async def get_previous_month_outgoing(session: AsyncSession) -> list[PaymentOut]:
-        """Get outgoing payments for the previous month."""
-        return await PaymentOutCRUD.get_previous_month(session)
+import asyncio
+import calendar
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from bot.database.crud import (
+    PaymentInCRUD,
+    PaymentInRow,
+    PaymentOutCRUD,
+    PaymentOutRow,
+    get_period_payments,
+)
+from bot.database.models import Database, PaymentIn, PaymentOut
+
+
+@dataclass
+class DebitCreditReport:
+    """Report with debit/credit information. Amounts are in cents."""
+
+    total_incoming: int
+    total_outgoing: int
+    incoming_count: int
+    outgoing_count: int
+
+    @property
+    def balance(self) -> int:
+        return self.total_incoming - self.total_outgoing
+
+
+@dataclass
+class BalanceReport:
+    """Current balance report. Amounts are in cents."""
+
+    total_incoming: int
+    total_outgoing: int
+
+    @property
+    def balance(self) -> int:
+        return self.total_incoming - self.total_outgoing
+
+
+async def _run(db: Database, query):
+    """Run a single CRUD query on its own session.
+
+    Queries launched concurrently via asyncio.gather must not share one
+    AsyncSession, so each gets a dedicated session from the factory.
+    """
+    async with db.session_factory() as session:
+        return await query(session)
+
+
+def _month_bounds(offset: int = 0) -> tuple[date, date]:
+    """Inclusive (start, end) dates of the current month shifted by offset months."""
+    today = date.today()
+    month = today.month - 1 + offset
+    year = today.year + month // 12
+    month = month % 12 + 1
+    last_day = calendar.monthrange(year, month)[1]
+    return date(year, month, 1), date(year, month, last_day)
+
+
+class ReportsService:
+    """Service for generating reports."""
+
+    @staticmethod
+    async def get_debit_credit(db: Database) -> DebitCreditReport:
+        """Get debit/credit report for the current month."""
+        start, end = _month_bounds()
+        (total_incoming, incoming_count), (total_outgoing, outgoing_count) = (
+            await asyncio.gather(
+                _run(db, lambda s: PaymentInCRUD.get_totals_by_date_range(s, start, end)),
+                _run(db, lambda s: PaymentOutCRUD.get_totals_by_date_range(s, start, end)),
+            )
+        )
+
+        return DebitCreditReport(
+            total_incoming=total_incoming,
+            total_outgoing=total_outgoing,
+            incoming_count=incoming_count,
+            outgoing_count=outgoing_count,
+        )
+
+    @staticmethod
+    async def get_balance(db: Database) -> BalanceReport:
+        """Get current balance for current month."""
+        start, end = _month_bounds()
+        (total_incoming, _), (total_outgoing, _) = await asyncio.gather(
+            _run(db, lambda s: PaymentInCRUD.get_totals_by_date_range(s, start, end)),
+            _run(db, lambda s: PaymentOutCRUD.get_totals_by_date_range(s, start, end)),
+        )
+
+        return BalanceReport(
+            total_incoming=total_incoming,
+            total_outgoing=total_outgoing,
+        )
+
+    @staticmethod
+    async def get_last_incoming(db: Database) -> PaymentIn | None:
+        """Get the last incoming payment."""
+        return await _run(db, PaymentInCRUD.get_last)
+
+    @staticmethod
+    async def get_last_outgoing(db: Database) -> PaymentOut | None:
+        """Get the last outgoing payment."""
+        return await _run(db, PaymentOutCRUD.get_last)
+
+    @staticmethod
+    async def get_last_7_days(db: Database) -> tuple[list[PaymentInRow], list[PaymentOutRow]]:
+        """Get incoming and outgoing payments for the last 7 days."""
+        week_ago = date.today() - timedelta(days=7)
+        return await _run(db, lambda s: get_period_payments(s, week_ago))
+
+    @staticmethod
+    async def get_current_month(db: Database) -> tuple[list[PaymentInRow], list[PaymentOutRow]]:
+        """Get incoming and outgoing payments for the current month."""
+        start, end = _month_bounds()
+        return await _run(db, lambda s: get_period_payments(s, start, end))
+
+    @staticmethod
+    async def get_previous_month(db: Database) -> tuple[list[PaymentInRow], list[PaymentOutRow]]:
+        """Get incoming and outgoing payments for the previous month."""
+        start, end = _month_bounds(-1)
+        return await _run(db, lambda s: get_period_payments(s, start, end))